@@ -0,0 +1,131 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+DEFAULT_CONCURRENCY = 4
+
+
+def load_prompts(input_path):
+    """
+    Reads a batch file with one prompt per line.
+
+    Each line is either a JSON object with a "prompt" and an optional "id",
+    or a bare JSON string. Prompts without an id are numbered by line.
+
+    Returns:
+        List of (id, prompt) tuples in file order
+
+    Raises:
+        ValueError for a line that is not a valid prompt
+    """
+    prompts = []
+    with open(input_path, "r", encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{input_path}:{number}: invalid JSON - {e}")
+            if isinstance(item, str):
+                item = {"prompt": item}
+            if not isinstance(item, dict) or not isinstance(item.get("prompt"), str):
+                raise ValueError(f'{input_path}:{number}: expected a "prompt" string')
+            prompts.append((item.get("id", number), item["prompt"]))
+    return prompts
+
+
+def completed_ids(output_path):
+    """
+    Returns the ids that already have a successful record in output_path.
+
+    A line cut short by an interrupted run is ignored, so that prompt runs
+    again on resume.
+    """
+    done = set()
+    try:
+        with open(output_path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and record.get("status") == "ok":
+                    done.add(json.dumps(record.get("id")))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+async def _run_one(run_session, prompt_id, prompt):
+    started_at = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+    start = time.perf_counter()
+    record = {"id": prompt_id, "prompt": prompt, "started_at": started_at}
+    try:
+        response = await run_session(prompt_id, prompt)
+        if response is None:
+            record.update(status="error", error="Session ended without a final response")
+        else:
+            record.update(status="ok", response=response)
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    record["duration_seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+async def run_batch(
+    run_session,
+    input_path,
+    output_path,
+    concurrency=DEFAULT_CONCURRENCY,
+    resume=False,
+):
+    """
+    Runs every prompt in input_path through run_session, at most
+    concurrency sessions at a time, and writes one JSON record per prompt
+    to output_path as each session finishes.
+
+    Records are flushed immediately, so an interrupted batch can be rerun
+    with resume=True: prompts that already have an "ok" record are skipped
+    and new records are appended.
+
+    Args:
+        run_session: Coroutine function taking a prompt id and a prompt and
+            returning the final text, or None if the session produced none
+        input_path: JSONL file of prompts (see load_prompts)
+        output_path: JSONL file the records are written to
+        concurrency: Maximum number of sessions running at once
+        resume: If True, skip completed prompts and append to output_path
+
+    Returns:
+        Dict with "ok", "error" and "skipped" counts and "seconds" elapsed
+    """
+    prompts = load_prompts(input_path)
+    done = completed_ids(output_path) if resume else set()
+    queue = asyncio.Queue()
+    for prompt_id, prompt in prompts:
+        if json.dumps(prompt_id) not in done:
+            queue.put_nowait((prompt_id, prompt))
+
+    counts = {"ok": 0, "error": 0, "skipped": len(prompts) - queue.qsize()}
+    start = time.perf_counter()
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as output:
+
+        async def worker():
+            while True:
+                try:
+                    prompt_id, prompt = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                record = await _run_one(run_session, prompt_id, prompt)
+                counts[record["status"]] += 1
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+
+        workers = max(1, min(concurrency, queue.qsize()))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+
+    counts["seconds"] = round(time.perf_counter() - start, 3)
+    return counts
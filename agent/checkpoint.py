@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+DEFAULT_SESSION_DIR = os.path.join(".agent_cache", "sessions")
+FORMAT_VERSION = 1
+
+
+def call_key(function_call):
+    """
+    Returns a stable key for a function call's name and arguments.
+    """
+    return json.dumps(
+        [function_call.name, function_call.args or {}], sort_keys=True, default=str
+    )
+
+
+def _dump(model):
+    return model.model_dump(mode="json", exclude_none=True)
+
+
+def _is_tool_turn(content):
+    parts = content.parts or []
+    return content.role == "user" and parts and all(p.function_response for p in parts)
+
+
+def _function_calls(content):
+    if content is None or content.role != "model":
+        return []
+    return [part.function_call for part in content.parts or [] if part.function_call]
+
+
+class SessionCheckpoint:
+    """
+    Append-only JSON-lines record of one session, enough to rebuild its
+    messages and carry on after the process died.
+
+    Each line is one record:
+      {"t": "start", ...}        the prompt and workspace the session
+                                 was started with
+      {"t": "msg", "content": …} a message other than tool responses
+      {"t": "tool", "key": …, "part": …}
+                                 one function response, written as soon
+                                 as the call finishes
+      {"t": "turn"}              the responses to the last model message
+                                 are complete; they are rebuilt from the
+                                 "tool" records instead of stored twice
+      {"t": "iter", "n": …}      iterations completed so far
+
+    Records are only ever appended, so a checkpoint costs one short write
+    per message or tool call however long the history gets.
+    """
+
+    def __init__(self, path, session_id):
+        self.path = path
+        self.session_id = session_id
+        self.messages = []
+        self.iterations = 0
+        self.workspace = None
+        # Responses already recorded for the calls of an unfinished turn
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    @classmethod
+    def create(cls, prompt, directory=DEFAULT_SESSION_DIR, workspace=None):
+        from google.genai import types
+
+        os.makedirs(directory, exist_ok=True)
+        session_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}"
+        checkpoint = cls(os.path.join(directory, f"{session_id}.jsonl"), session_id)
+        checkpoint.messages.append(types.Content(role="user", parts=[types.Part(text=prompt)]))
+        checkpoint.workspace = os.path.abspath(workspace) if workspace else None
+        checkpoint._write(
+            {
+                "t": "start",
+                "v": FORMAT_VERSION,
+                "prompt": prompt,
+                "workspace": checkpoint.workspace,
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+        )
+        return checkpoint
+
+    @classmethod
+    def load(cls, session, directory=DEFAULT_SESSION_DIR):
+        """
+        Opens the checkpoint of session (an id or a path) and rebuilds its
+        messages. A last line cut short by a crash is ignored.
+
+        Raises:
+            FileNotFoundError if there is no such session
+            ValueError if the file is not a session checkpoint
+        """
+        from google.genai import types
+
+        path = session if session.endswith(".jsonl") else os.path.join(directory, f"{session}.jsonl")
+        session_id = os.path.splitext(os.path.basename(path))[0]
+        checkpoint = cls(path, session_id)
+
+        with open(path, "r", encoding="utf-8") as file:
+            lines = file.readlines()
+        for number, line in enumerate(lines, start=1):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                if number == len(lines):
+                    break
+                raise ValueError(f"{path}:{number}: corrupt checkpoint record")
+            kind = record.get("t")
+            if kind == "start":
+                checkpoint.workspace = record.get("workspace")
+                checkpoint.messages.append(
+                    types.Content(role="user", parts=[types.Part(text=record["prompt"])])
+                )
+            elif kind == "msg":
+                # Streamed calls can finish before their model message is written,
+                # so "tool" records are kept until the turn is complete
+                checkpoint.messages.append(types.Content.model_validate(record["content"]))
+            elif kind == "tool":
+                part = types.Part.model_validate(record["part"])
+                checkpoint._pending.setdefault(record["key"], []).append(part)
+            elif kind == "turn":
+                calls = _function_calls(checkpoint.messages[-1] if checkpoint.messages else None)
+                parts = [checkpoint._take(call_key(call)) for call in calls]
+                if None in parts:
+                    raise ValueError(f"{path}:{number}: turn is missing tool responses")
+                checkpoint.messages.append(types.Content(role="user", parts=parts))
+                checkpoint._pending = {}
+            elif kind == "iter":
+                checkpoint.iterations = record["n"]
+        if not checkpoint.messages:
+            raise ValueError(f"{path} is not a session checkpoint")
+
+        # A crash may have cut the file mid-line; start appending on a fresh one
+        if lines and not lines[-1].endswith("\n"):
+            with open(path, "a", encoding="utf-8") as file:
+                file.write("\n")
+        return checkpoint
+
+    def _take(self, key):
+        parts = self._pending.get(key)
+        return parts.pop(0) if parts else None
+
+    def pending_calls(self):
+        """
+        Returns the function calls of the last model message if their
+        responses were never completed.
+        """
+        return _function_calls(self.messages[-1] if self.messages else None)
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+
+    def append_message(self, content):
+        """
+        on_append callback for ConversationHistory.
+        """
+        if _is_tool_turn(content):
+            self._write({"t": "turn"})
+        else:
+            self._write({"t": "msg", "content": _dump(content)})
+
+    def mark_iteration(self, number):
+        self.iterations = number
+        self._write({"t": "iter", "n": number})
+
+    def wrap_call(self, call, verbose=False):
+        """
+        Wraps call(function_call) -> types.Content so every result is
+        recorded, and calls whose response was recorded before a crash
+        return it instead of running again.
+        """
+
+        def checkpointed(function_call):
+            from google.genai import types
+
+            key = call_key(function_call)
+            with self._lock:
+                part = self._take(key)
+            if part is not None:
+                if verbose:
+                    print(f" - Reusing recorded result: {function_call.name}")
+                return types.Content(role="tool", parts=[part])
+            result = call(function_call)
+            if result.parts:
+                self._write({"t": "tool", "key": key, "part": _dump(result.parts[0])})
+            return result
+
+        return checkpointed
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
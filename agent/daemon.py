@@ -0,0 +1,318 @@
+"""
+Long-lived agent process serving sessions over a local unix socket.
+
+The protocol is JSON-RPC 2.0 style, one JSON object per line in each
+direction. A connection may send several requests without waiting; each
+response carries the id of its request and they can arrive in any order.
+
+    {"jsonrpc": "2.0", "id": 1, "method": "run",
+     "params": {"prompt": "...", "workspace": "./calculator"}}
+    -> {"jsonrpc": "2.0", "id": 1,
+        "result": {"session": "3", "response": "...", "duration_seconds": 4.2}}
+
+Methods: run, status, shutdown. Errors come back as
+{"error": {"code": ..., "message": ...}} with the JSON-RPC codes below.
+
+From a shell, use the client in this module:
+    python -m agent.daemon --socket .agent_cache/agent.sock "Run the tests"
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+
+DEFAULT_SOCKET = os.path.join(".agent_cache", "agent.sock")
+DEFAULT_CONCURRENCY = 8
+
+# Longest request line accepted, prompts included
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+SESSION_FAILED = -32000
+
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class AgentDaemon:
+    """
+    Accepts run requests on socket_path and hands each to
+    run_session(session_id, prompt, workspace), an async callable that
+    returns the final response. At most `concurrency` sessions run at
+    once; the rest wait in arrival order.
+
+    Whatever run_session closes over (the model client, caches, the rate
+    limiter) is shared by every session for the life of the process.
+    status() may return extra fields for the status method.
+    """
+
+    def __init__(
+        self,
+        run_session,
+        socket_path=DEFAULT_SOCKET,
+        concurrency=DEFAULT_CONCURRENCY,
+        default_workspace=None,
+        status=None,
+    ):
+        self.run_session = run_session
+        self.socket_path = socket_path
+        self.concurrency = concurrency
+        self.default_workspace = default_workspace
+        self.extra_status = status
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self._session_count = 0
+        self._started = time.monotonic()
+        self._slots = None
+        self._stopping = None
+        self._requests = set()
+        self._connections = set()
+
+    async def serve(self):
+        """
+        Serves until shutdown is requested or stop() is called, then waits
+        for the sessions in progress to finish.
+        """
+        # Only the server needs asyncio; the client below starts without it
+        import asyncio
+
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._stopping = asyncio.Event()
+        _remove_stale_socket(self.socket_path)
+        directory = os.path.dirname(self.socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        server = await asyncio.start_unix_server(
+            self._handle_connection, path=self.socket_path, limit=MAX_LINE_BYTES
+        )
+        # Anyone who can connect can run tools, so only the owner may
+        os.chmod(self.socket_path, 0o600)
+        try:
+            await self._stopping.wait()
+            server.close()
+            if self._requests:
+                await asyncio.gather(*self._requests, return_exceptions=True)
+            # Idle connections would keep wait_closed() waiting
+            for writer in list(self._connections):
+                writer.close()
+            await server.wait_closed()
+        finally:
+            server.close()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def _handle_connection(self, reader, writer):
+        import asyncio
+
+        write_lock = asyncio.Lock()
+        pending = set()
+        self._connections.add(writer)
+        try:
+            while not self._stopping.is_set():
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # Line over MAX_LINE_BYTES, or the client went away
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self._respond(line, writer, write_lock))
+                pending.add(task)
+                self._requests.add(task)
+                task.add_done_callback(pending.discard)
+                task.add_done_callback(self._requests.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _respond(self, line, writer, write_lock):
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise RpcError(PARSE_ERROR, f"Invalid JSON - {e}")
+            if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                raise RpcError(INVALID_REQUEST, 'Expected an object with a "method"')
+            request_id = request.get("id")
+            params = request.get("params") or {}
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, '"params" must be an object')
+            response = {"result": await self._call(request["method"], params)}
+        except RpcError as e:
+            response = {"error": {"code": e.code, "message": e.message}}
+        except Exception as e:
+            # Always answer, or the client would wait forever
+            response = {"error": {"code": INTERNAL_ERROR, "message": f"Internal error - {e}"}}
+        response = {"jsonrpc": "2.0", "id": request_id, **response}
+
+        data = (json.dumps(response, ensure_ascii=False, default=str) + "\n").encode()
+        async with write_lock:
+            try:
+                writer.write(data)
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def _call(self, method, params):
+        if method == "run":
+            return await self._run(params)
+        if method == "status":
+            return self.status()
+        if method == "shutdown":
+            self.stop()
+            return {"stopping": True, "active_sessions": self.active}
+        raise RpcError(METHOD_NOT_FOUND, f"Unknown method: {method}")
+
+    async def _run(self, params):
+        prompt = params.get("prompt")
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise RpcError(INVALID_PARAMS, '"prompt" must be a non-empty string')
+        workspace = params.get("workspace") or self.default_workspace
+        if not isinstance(workspace, str) or not os.path.isdir(workspace):
+            raise RpcError(INVALID_PARAMS, f"Workspace is not a directory: {workspace}")
+
+        self._session_count += 1
+        session_id = str(params.get("session") or self._session_count)
+        async with self._slots:
+            self.active += 1
+            started = time.monotonic()
+            try:
+                response = await self.run_session(session_id, prompt, workspace)
+            except Exception as e:
+                self.failed += 1
+                raise RpcError(SESSION_FAILED, f"Session {session_id} failed - {e}")
+            finally:
+                self.active -= 1
+        self.completed += 1
+        return {
+            "session": session_id,
+            "response": response,
+            "duration_seconds": round(time.monotonic() - started, 3),
+        }
+
+    def status(self):
+        status = {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.monotonic() - self._started, 1),
+            "active_sessions": self.active,
+            "open_requests": len(self._requests),
+            "completed_sessions": self.completed,
+            "failed_sessions": self.failed,
+            "concurrency": self.concurrency,
+        }
+        if self.extra_status:
+            status.update(self.extra_status())
+        return status
+
+
+def _remove_stale_socket(socket_path):
+    """
+    Removes a socket left behind by a daemon that died, or raises
+    OSError if a daemon is still listening on it.
+    """
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.remove(socket_path)
+        return
+    finally:
+        probe.close()
+    raise OSError(f"A daemon is already listening on {socket_path}")
+
+
+def request(socket_path, method, params=None, timeout=None):
+    """
+    Sends one request to a daemon and returns its result.
+
+    Raises:
+        RpcError for an error response
+        OSError if the daemon can't be reached
+    """
+    message = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params or {}}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        connection.connect(socket_path)
+        connection.sendall((json.dumps(message) + "\n").encode())
+        with connection.makefile("r", encoding="utf-8") as replies:
+            line = replies.readline()
+    if not line:
+        raise OSError("The daemon closed the connection without answering")
+    response = json.loads(line)
+    if "error" in response:
+        raise RpcError(response["error"].get("code"), response["error"].get("message"))
+    return response["result"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m agent.daemon",
+        description="Client for an agent daemon started with: python main.py --serve",
+    )
+    parser.add_argument("prompt", nargs="*")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--workspace", help="Directory the session's tools work in")
+    parser.add_argument("--status", action="store_true")
+    parser.add_argument("--shutdown", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.status or args.shutdown:
+        method, params = ("status" if args.status else "shutdown"), {}
+    elif args.prompt:
+        params = {"prompt": " ".join(args.prompt)}
+        if args.workspace:
+            # The daemon may run from another directory
+            params["workspace"] = os.path.abspath(args.workspace)
+        method = "run"
+    else:
+        parser.print_usage()
+        return 1
+
+    try:
+        result = request(args.socket, method, params)
+    except RpcError as e:
+        print(f"Error: {e.message}")
+        return 1
+    except OSError as e:
+        print(f"Error: Cannot reach the daemon at {args.socket} - {e}")
+        return 1
+
+    if method == "run":
+        print(result["response"] or "(no response)")
+    else:
+        print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
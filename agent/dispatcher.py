@@ -0,0 +1,135 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+DEFAULT_MAX_WORKERS = 4
+
+READ = "read"
+WRITE = "write"
+
+# Which argument names the path a tool touches, and how it touches it.
+# A path of None means the whole working directory.
+TOOL_ACCESS = {
+    "get_files_info": ("directory", READ),
+    "get_file_content": ("file_path", READ),
+    "run_python_file": (None, READ),
+    "write_file": ("file_path", WRITE),
+    "search_code": (None, READ),
+    "edit_file": ("file_path", WRITE),
+    "read_files": (None, READ),
+    "run_tests": (None, READ),
+}
+
+
+def tool_access(function_call):
+    """
+    Returns (path, mode) describing what a function call touches.
+
+    Unknown tools are treated as writing the whole working directory so they
+    are never reordered against anything else.
+    """
+    if function_call.name not in TOOL_ACCESS:
+        return None, WRITE
+
+    arg_name, mode = TOOL_ACCESS[function_call.name]
+    if arg_name is None:
+        return None, mode
+
+    path = (function_call.args or {}).get(arg_name) or "."
+    if not isinstance(path, str):
+        return None, WRITE
+    return os.path.normpath(path), mode
+
+
+def _paths_overlap(a, b):
+    if a is None or b is None or a == "." or b == ".":
+        return True
+    return a == b or a.startswith(b + os.sep) or b.startswith(a + os.sep)
+
+
+def conflicts(first, second):
+    """
+    Two accesses conflict if at least one writes and their paths overlap.
+    """
+    (path_a, mode_a), (path_b, mode_b) = first, second
+    if mode_a == READ and mode_b == READ:
+        return False
+    return _paths_overlap(path_a, path_b)
+
+
+class ToolDispatcher:
+    """
+    Runs function calls on a bounded thread pool.
+
+    Calls start as soon as every earlier call they conflict with has finished,
+    so independent reads overlap while writes to the same path keep the order
+    the model issued them in. Each call runs in a copy of the submitter's
+    contextvars, so its trace span nests under the span that submitted it.
+    """
+
+    def __init__(self, call, max_workers=DEFAULT_MAX_WORKERS):
+        self._call = call
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="tool"
+        )
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def submit(self, function_call):
+        """
+        Schedules one function call and returns a Future for its result.
+        """
+        access = tool_access(function_call)
+        result = Future()
+        context = contextvars.copy_context()
+
+        with self._lock:
+            self._pending = [(a, f) for a, f in self._pending if not f.done()]
+            deps = [f for a, f in self._pending if conflicts(a, access)]
+            self._pending.append((access, result))
+
+        if not deps:
+            self._start(function_call, result, context)
+            return result
+
+        remaining = [len(deps)]
+        remaining_lock = threading.Lock()
+
+        def on_dep_done(_):
+            with remaining_lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                self._start(function_call, result, context)
+
+        for dep in deps:
+            dep.add_done_callback(on_dep_done)
+        return result
+
+    def _start(self, function_call, result, context):
+        def run():
+            if not result.set_running_or_notify_cancel():
+                return
+            try:
+                result.set_result(self._call(function_call))
+            except BaseException as e:
+                result.set_exception(e)
+
+        self._executor.submit(context.run, run)
+
+    def dispatch(self, function_calls):
+        """
+        Runs a turn's function calls and returns their results in call order.
+        """
+        futures = [self.submit(fc) for fc in function_calls]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,227 @@
+import json
+import os
+
+from agent.dispatcher import READ, WRITE, tool_access
+
+DEFAULT_TOKEN_BUDGET = 50000
+DEFAULT_KEEP_RECENT = 4
+
+# Rough size of a token for Gemini models, used to estimate prompt size
+# without a count_tokens round trip
+CHARS_PER_TOKEN = 4
+
+PREVIEW_CHARS = 200
+
+
+def estimate_tokens(contents):
+    """
+    Estimates the token count of a list of types.Content.
+    """
+    chars = 0
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+            elif part.function_call:
+                chars += len(part.function_call.name or "")
+                chars += len(json.dumps(part.function_call.args or {}, default=str))
+            elif part.function_response:
+                chars += len(part.function_response.name or "")
+                chars += len(
+                    json.dumps(part.function_response.response or {}, default=str)
+                )
+    return chars // CHARS_PER_TOKEN
+
+
+def _describe_call(function_call):
+    args = ", ".join(
+        f"{key}={value!r}" for key, value in (function_call.args or {}).items()
+    )
+    return f"{function_call.name}({args})"
+
+
+def _stub_part(part, stub):
+    from google.genai import types
+
+    return types.Part(
+        function_response=types.FunctionResponse(
+            id=part.function_response.id,
+            name=part.function_response.name,
+            response={"result": stub},
+        )
+    )
+
+
+class ConversationHistory:
+    """
+    Owns the messages of a session and builds the prompt sent each turn.
+
+    The full history is kept in `messages`. prompt() returns a compacted
+    view: outputs of reads that were invalidated by a later write are
+    replaced with stubs, and if the estimate is still over the token budget
+    the oldest tool outputs are replaced with short previews. The first
+    user message and the most recent messages are never touched.
+    """
+
+    def __init__(
+        self,
+        messages,
+        token_budget=DEFAULT_TOKEN_BUDGET,
+        keep_recent=DEFAULT_KEEP_RECENT,
+        on_append=None,
+    ):
+        self.messages = messages
+        # Called with each appended message, e.g. to checkpoint it
+        self.on_append = on_append
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.last_prompt_tokens = 0
+        self.last_compacted = 0
+
+    def append(self, content):
+        self.messages.append(content)
+        if self.on_append:
+            self.on_append(content)
+
+    def _tool_outputs(self):
+        """
+        Yields (message_index, part_index, function_call) for every function
+        response, pairing it with the call that produced it.
+        """
+        calls = []
+        for i, content in enumerate(self.messages):
+            parts = content.parts or []
+            if content.role == "model":
+                calls = [part.function_call for part in parts if part.function_call]
+                continue
+            response_index = 0
+            for j, part in enumerate(parts):
+                if not part.function_response:
+                    continue
+                call = calls[response_index] if response_index < len(calls) else None
+                response_index += 1
+                yield i, j, call
+
+    def _stale_outputs(self, outputs):
+        """
+        Returns the outputs of reads whose path was written afterwards.
+        """
+        stale = set()
+        later_writes = []
+        for i, j, call in reversed(outputs):
+            if call is None:
+                continue
+            path, mode = tool_access(call)
+            if mode == WRITE and path is not None:
+                later_writes.append(path)
+            elif mode == READ:
+                for path in self._read_paths(i, j, call, path):
+                    if any(
+                        path == written
+                        or written.startswith(path + os.sep)
+                        or path == "."
+                        for written in later_writes
+                    ):
+                        stale.add((i, j))
+                        break
+        return stale
+
+    def _read_paths(self, i, j, call, path):
+        """
+        Returns the paths a read's output depends on: its path argument,
+        or for read_files the paths listed in its result.
+        """
+        if path is not None:
+            return [path]
+        if call.name != "read_files":
+            return []
+        response = self.messages[i].parts[j].function_response.response or {}
+        result = response.get("result")
+        files = result.get("files") if isinstance(result, dict) else None
+        return [
+            os.path.normpath(file["path"])
+            for file in files or []
+            if isinstance(file, dict) and isinstance(file.get("path"), str)
+        ]
+
+    def prompt(self):
+        """
+        Returns the list of types.Content to send to the model this turn.
+        """
+        outputs = list(self._tool_outputs())
+        first_protected = max(1, len(self.messages) - self.keep_recent)
+        candidates = [o for o in outputs if 0 < o[0] < first_protected]
+
+        replacements = {}
+        stale = self._stale_outputs(outputs)
+        for i, j, call in candidates:
+            if (i, j) in stale:
+                replacements[(i, j)] = (
+                    f"[stale output of {_describe_call(call)} omitted: "
+                    "the path was written later in this session]"
+                )
+
+        tokens = estimate_tokens(self._apply(replacements))
+
+        # Oldest outputs go first until the prompt fits the budget
+        for i, j, call in candidates:
+            if tokens <= self.token_budget:
+                break
+            if (i, j) in replacements:
+                continue
+            part = self.messages[i].parts[j]
+            response = part.function_response.response or {}
+            text = str(response.get("result", response.get("error", response)))
+            if len(text) <= PREVIEW_CHARS:
+                continue
+            name = _describe_call(call) if call else part.function_response.name
+            stub = (
+                f"[output of {name} compacted, {len(text)} characters; "
+                f"call it again if needed. Preview: {text[:PREVIEW_CHARS]}]"
+            )
+            replacements[(i, j)] = stub
+            saved = len(json.dumps(response, default=str)) - len(json.dumps(stub))
+            tokens -= saved // CHARS_PER_TOKEN
+
+        contents = self._apply(replacements)
+        tokens = estimate_tokens(contents)
+        self.last_prompt_tokens = tokens
+        self.last_compacted = len(replacements)
+        return contents
+
+    def _apply(self, replacements):
+        if not replacements:
+            return list(self.messages)
+        from google.genai import types
+
+        contents = []
+        for i, content in enumerate(self.messages):
+            parts = content.parts or []
+            if not any((i, j) in replacements for j in range(len(parts))):
+                contents.append(content)
+                continue
+            contents.append(
+                types.Content(
+                    role=content.role,
+                    parts=[
+                        _stub_part(part, replacements[(i, j)])
+                        if (i, j) in replacements
+                        else part
+                        for j, part in enumerate(parts)
+                    ],
+                )
+            )
+        return contents
+
+    def report(self, usage_metadata=None):
+        """
+        Returns a one-line summary of the last prompt's size.
+        """
+        line = (
+            f"Prompt size: ~{self.last_prompt_tokens} tokens estimated, "
+            f"{len(self.messages)} messages, "
+            f"{self.last_compacted} tool outputs compacted"
+        )
+        if usage_metadata and usage_metadata.prompt_token_count:
+            line += f" ({usage_metadata.prompt_token_count} tokens reported by the model)"
+        return line
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Token bucket allowing requests_per_minute requests, with bursts of up to
+    burst requests.
+
+    Callers reserve a token under a lock and then wait outside it, so one
+    limiter can be shared by threads and by many sessions on an event loop;
+    requests are served in the order they reserved.
+    """
+
+    def __init__(self, requests_per_minute, burst=1):
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes a token and returns how many seconds to wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self):
+        """
+        Waits for a token; returns the seconds spent waiting.
+        """
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+    def acquire_sync(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+        return delay
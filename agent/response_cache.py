@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from agent.tracing import annotate
+
+DEFAULT_CACHE_DIR = os.path.join(".agent_cache", "responses")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class CacheMissError(RuntimeError):
+    pass
+
+
+def _dump(model):
+    return model.model_dump(mode="json", exclude_none=True)
+
+
+def request_key(kind, model, contents, config):
+    """
+    Returns a stable hash of everything that determines a model response.
+    """
+    from google.genai import types
+
+    config = config or types.GenerateContentConfig()
+    system_instruction = config.system_instruction
+    if hasattr(system_instruction, "model_dump"):
+        system_instruction = _dump(system_instruction)
+    payload = {
+        "kind": kind,
+        "model": model,
+        "system_instruction": system_instruction,
+        "tools": [_dump(tool) for tool in config.tools or []],
+        "contents": [_dump(content) for content in contents],
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk store for model responses.
+
+    Each entry is one JSON file named after its request key. The total size
+    is kept under max_bytes by evicting the least recently used entries,
+    where a hit refreshes the entry's mtime. In replay mode a miss raises
+    CacheMissError instead of reaching the service.
+    """
+
+    def __init__(
+        self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, replay=False
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = None
+        self._total_bytes = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self):
+        if self._entries is not None:
+            return
+        entries = []
+        os.makedirs(self.directory, exist_ok=True)
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".json") and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, entry.path, stat.st_size))
+        entries.sort()
+        self._entries = OrderedDict((path, size) for _, path, size in entries)
+        self._total_bytes = sum(self._entries.values())
+
+    def get(self, key):
+        """
+        Returns the cached list of response dicts for key, or None.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                chunks = json.load(file)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            annotate(cache="miss")
+            if self.replay:
+                raise CacheMissError(f"No cached response for request {key[:12]}")
+            return None
+
+        annotate(cache="hit")
+        with self._lock:
+            self.hits += 1
+            self._load_index()
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return chunks
+
+    def put(self, key, chunks):
+        data = json.dumps(chunks, separators=(",", ":")).encode("utf-8")
+        path = self._path(key)
+        with self._lock:
+            self._load_index()
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+
+            self._total_bytes -= self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_path, size = self._entries.popitem(last=False)
+                self._total_bytes -= size
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+
+class CachedModels:
+    """
+    Drop-in wrapper for client.models or client.aio.models that serves
+    responses from a ResponseCache.
+    """
+
+    def __init__(self, models, cache):
+        self._models = models
+        self.cache = cache
+
+    def generate_content(self, *, model, contents, config=None):
+        key = request_key("generate_content", model, contents, config)
+        cached = self.cache.get(key)
+        if cached is not None:
+            from google.genai import types
+
+            return types.GenerateContentResponse.model_validate(cached[0])
+
+        response = self._models.generate_content(
+            model=model, contents=contents, config=config
+        )
+        self.cache.put(key, [_dump(response)])
+        return response
+
+    async def generate_content_stream(self, *, model, contents, config=None):
+        key = request_key("generate_content_stream", model, contents, config)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self._replay(cached)
+
+        stream = await self._models.generate_content_stream(
+            model=model, contents=contents, config=config
+        )
+        return self._record(key, stream)
+
+    async def _replay(self, chunks):
+        from google.genai import types
+
+        for chunk in chunks:
+            yield types.GenerateContentResponse.model_validate(chunk)
+
+    async def _record(self, key, stream):
+        chunks = []
+        async for chunk in stream:
+            chunks.append(_dump(chunk))
+            yield chunk
+        self.cache.put(key, chunks)
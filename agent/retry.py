@@ -0,0 +1,271 @@
+import asyncio
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+
+from agent.tracing import annotate
+
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_CALL_TIMEOUT = 60.0
+# Longer server-requested waits give up instead of stalling the session
+DEFAULT_MAX_RETRY_AFTER = 300.0
+
+# HTTP statuses worth retrying: timeouts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+RETRY_DELAY_RE = re.compile(r"^\s*([\d.]+)s\s*$")
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def _retry_reason(error):
+    """
+    Returns a short reason if error is transient and worth retrying,
+    otherwise None.
+    """
+    if isinstance(error, DeadlineExceeded):
+        return None
+    if isinstance(error, TimeoutError):
+        return "timeout"
+
+    # Only reached after a request failed, so the SDK is already loaded
+    import httpx
+    from google.genai import errors
+
+    if isinstance(error, errors.APIError):
+        return str(error.code) if error.code in RETRYABLE_STATUS_CODES else None
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(error, httpx.TransportError):
+        return type(error).__name__
+    return None
+
+
+def retry_after(error):
+    """
+    Returns the server's requested delay in seconds, from a Retry-After
+    header or a google.rpc.RetryInfo detail, or None if there is none or
+    it is not a finite number of seconds.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    if value:
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError, OverflowError):
+                seconds = None
+        if seconds is not None and math.isfinite(seconds):
+            return max(0.0, seconds)
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        details = details.get("error", details)
+        details = details.get("details") if isinstance(details, dict) else None
+    for detail in details if isinstance(details, list) else []:
+        if isinstance(detail, dict) and str(detail.get("@type", "")).endswith("RetryInfo"):
+            match = RETRY_DELAY_RE.match(str(detail.get("retryDelay", "")))
+            try:
+                return float(match.group(1)) if match else None
+            except ValueError:
+                return None
+    return None
+
+
+class RetryStats:
+    """
+    Counters shared by every RetryingModels of a run.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.backoff_seconds = 0.0
+        self.limiter_seconds = 0.0
+        self.reasons = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def add_reason(self, reason):
+        with self._lock:
+            self.reasons[reason] += 1
+
+    def summary(self):
+        reasons = ", ".join(f"{reason} x{count}" for reason, count in self.reasons.most_common())
+        return (
+            f"Model requests: {self.requests} attempts, {self.retries} retries"
+            f"{f' ({reasons})' if reasons else ''}, {self.failures} gave up, "
+            f"{self.backoff_seconds:.1f}s backing off, "
+            f"{self.limiter_seconds:.1f}s waiting for the rate limiter"
+        )
+
+
+class RetryPolicy:
+    """
+    How RetryingModels retries: up to max_retries retries with full-jitter
+    exponential backoff between base_delay and max_delay seconds, each
+    attempt capped at call_timeout seconds. Server Retry-After hints are
+    honored in full instead; a hint longer than max_retry_after, or than
+    what is left of the session deadline, gives up rather than waiting.
+    """
+
+    def __init__(
+        self,
+        max_retries=DEFAULT_MAX_RETRIES,
+        base_delay=1.0,
+        max_delay=30.0,
+        call_timeout=DEFAULT_CALL_TIMEOUT,
+        max_retry_after=DEFAULT_MAX_RETRY_AFTER,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.call_timeout = call_timeout
+        self.max_retry_after = max_retry_after
+
+    def delay(self, retry, error):
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+        hint = retry_after(error)
+        if hint is not None:
+            # Honor the hint, with a little jitter so sessions don't wake together
+            return hint + random.uniform(0, self.base_delay)
+        return backoff
+
+
+class RetryingModels:
+    """
+    Wraps a models object (sync or async) with retries of transient
+    errors, a per-attempt timeout, a deadline for the whole session and an
+    optional shared RateLimiter that every attempt goes through.
+
+    Create one per session; the limiter and stats can be shared. Streams
+    are retried until their first chunk arrives; after that an error is
+    passed on, since the caller has already seen part of the response.
+    """
+
+    def __init__(self, models, policy=None, limiter=None, stats=None, session_deadline=None):
+        self._models = models
+        self.policy = policy or RetryPolicy()
+        self.limiter = limiter
+        self.stats = stats or RetryStats()
+        self.deadline = time.monotonic() + session_deadline if session_deadline else None
+
+    def _remaining(self):
+        if self.deadline is None:
+            return None
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Session deadline exceeded")
+        return remaining
+
+    def _attempt_timeout(self):
+        remaining = self._remaining()
+        timeouts = [t for t in (self.policy.call_timeout, remaining) if t]
+        return min(timeouts) if timeouts else None
+
+    def _with_timeout(self, config, timeout):
+        if not timeout:
+            return config
+        from google.genai import types
+
+        config = config or types.GenerateContentConfig()
+        if config.http_options is not None:
+            return config
+        return config.model_copy(
+            update={"http_options": types.HttpOptions(timeout=int(timeout * 1000))}
+        )
+
+    def _next_delay(self, retry, error):
+        """
+        Returns how long to back off before retrying error, or raises it
+        if it is not transient or retrying would overrun a limit.
+        """
+        reason = _retry_reason(error)
+        if reason is None or retry >= self.policy.max_retries:
+            self.stats.add(failures=1)
+            raise error
+        delay = self.policy.delay(retry, error)
+        if delay > self.policy.max_retry_after:
+            self.stats.add(failures=1)
+            raise error
+        remaining = self._remaining()
+        if remaining is not None and delay >= remaining:
+            self.stats.add(failures=1)
+            raise DeadlineExceeded(
+                f"Session deadline leaves {remaining:.1f}s, retry needs {delay:.1f}s"
+            ) from error
+        self.stats.add(retries=1, backoff_seconds=delay)
+        self.stats.add_reason(reason)
+        return delay
+
+    def _annotate(self, retries, waited):
+        if retries:
+            annotate(retries=retries, retry_wait_ms=round(waited * 1000, 1))
+
+    def generate_content(self, *, model, contents, config=None):
+        waited = 0.0
+        for retry in range(self.policy.max_retries + 1):
+            timeout = self._attempt_timeout()
+            if self.limiter:
+                self.stats.add(limiter_seconds=self.limiter.acquire_sync())
+            self.stats.add(requests=1)
+            try:
+                response = self._models.generate_content(
+                    model=model, contents=contents, config=self._with_timeout(config, timeout)
+                )
+                self._annotate(retry, waited)
+                return response
+            except Exception as e:
+                delay = self._next_delay(retry, e)
+            waited += delay
+            time.sleep(delay)
+
+    async def generate_content_stream(self, *, model, contents, config=None):
+        waited = 0.0
+        for retry in range(self.policy.max_retries + 1):
+            timeout = self._attempt_timeout()
+            if self.limiter:
+                self.stats.add(limiter_seconds=await self.limiter.acquire())
+            self.stats.add(requests=1)
+            try:
+                stream, first = await asyncio.wait_for(
+                    self._open_stream(model, contents, self._with_timeout(config, timeout)),
+                    timeout,
+                )
+                self._annotate(retry, waited)
+                return self._resume(stream, first)
+            except Exception as e:
+                delay = self._next_delay(retry, e)
+            waited += delay
+            await asyncio.sleep(delay)
+
+    async def _open_stream(self, model, contents, config):
+        stream = await self._models.generate_content_stream(
+            model=model, contents=contents, config=config
+        )
+        try:
+            first = await anext(stream)
+        except StopAsyncIteration:
+            first = None
+        return stream, first
+
+    async def _resume(self, stream, first):
+        if first is None:
+            return
+        yield first
+        async for chunk in stream:
+            yield chunk
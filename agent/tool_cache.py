@@ -0,0 +1,133 @@
+import os
+import threading
+
+from agent.tracing import annotate
+
+# Read-only tools and the argument naming the path they read
+READ_ONLY_TOOLS = {
+    "get_file_content": "file_path",
+    "get_files_info": "directory",
+}
+
+# Tools that change the working directory, and the argument naming the path
+# they write (None when any path may have changed)
+WRITING_TOOLS = {
+    "write_file": "file_path",
+    "edit_file": "file_path",
+    "run_python_file": None,
+    "run_tests": None,
+}
+
+
+class ToolResultCache:
+    """
+    Memo of read-only tool results, per session or shared by the sessions
+    of a long-lived process.
+
+    Entries are grouped by real path, symlinks resolved, and keyed by its
+    mtime and size plus the arguments as given, so a file changed behind
+    our back is simply a miss and a write through any path to a file drops
+    the entries of every other path to it. Writes through the agent
+    also drop the written path and the listings of every directory above
+    it, since a listing shows child sizes, and recursive listings whole
+    subtrees, that don't change the listed directory's own mtime.
+    With max_paths, the paths cached longest ago are dropped first.
+    """
+
+    def __init__(self, verbose=False, max_paths=None):
+        self.verbose = verbose
+        self.max_paths = max_paths
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _log(self, outcome, name, kwargs):
+        annotate(cache=outcome)
+        if self.verbose:
+            args = {k: v for k, v in kwargs.items() if k != "working_directory"}
+            print(f"[tool cache] {outcome}: {name}({args})")
+
+    def _call_read_only(self, name, func, path_arg, kwargs):
+        path = kwargs.get(path_arg) or "."
+        try:
+            full_path = os.path.realpath(os.path.join(kwargs["working_directory"], path))
+            stat = os.stat(full_path)
+        except (KeyError, TypeError, ValueError, OSError):
+            return func(**kwargs)
+
+        # The path as given stays in the key: results quote it
+        args = tuple(sorted((k, repr(v)) for k, v in kwargs.items()))
+        key = (name, stat.st_mtime_ns, stat.st_size, args)
+
+        with self._lock:
+            entries = self._entries.get(full_path)
+            if entries and key in entries:
+                self.hits += 1
+                self._log("hit", name, kwargs)
+                return entries[key]
+            self.misses += 1
+        self._log("miss", name, kwargs)
+
+        result = func(**kwargs)
+        with self._lock:
+            self._entries.setdefault(full_path, {})[key] = result
+            if self.max_paths and len(self._entries) > self.max_paths:
+                del self._entries[next(iter(self._entries))]
+        return result
+
+    def invalidate(self, working_directory, path=None):
+        """
+        Drops entries for path and every directory above it, or all
+        directory listings when path is None.
+        """
+        with self._lock:
+            if path is None:
+                for full_path, entries in self._entries.items():
+                    for key in list(entries):
+                        if key[0] == "get_files_info":
+                            del entries[key]
+                return
+            full_path = os.path.realpath(os.path.join(working_directory, path))
+            while True:
+                self._entries.pop(full_path, None)
+                parent = os.path.dirname(full_path)
+                if parent == full_path:
+                    return
+                full_path = parent
+
+    def wrap(self, function_map):
+        """
+        Returns a copy of function_map with caching and invalidation applied.
+        """
+        wrapped = dict(function_map)
+        for name, func in function_map.items():
+            if name in READ_ONLY_TOOLS:
+                wrapped[name] = self._read_only_wrapper(name, func)
+            elif name in WRITING_TOOLS:
+                wrapped[name] = self._writing_wrapper(name, func)
+        return wrapped
+
+    def _read_only_wrapper(self, name, func):
+        path_arg = READ_ONLY_TOOLS[name]
+
+        def cached(**kwargs):
+            return self._call_read_only(name, func, path_arg, kwargs)
+
+        return cached
+
+    def _writing_wrapper(self, name, func):
+        path_arg = WRITING_TOOLS[name]
+
+        def invalidating(**kwargs):
+            try:
+                return func(**kwargs)
+            finally:
+                path = kwargs.get(path_arg) if path_arg else None
+                if path_arg is None or isinstance(path, str):
+                    self.invalidate(kwargs.get("working_directory", "."), path)
+
+        return invalidating
+
+    def summary(self):
+        return f"Tool cache: {self.hits} hits, {self.misses} misses"
@@ -0,0 +1,277 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# The span currently open in this thread or asyncio task
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+# Span attributes added up in the summary table
+SUMMED_ATTRS = ("bytes_in", "bytes_out", "prompt_tokens", "output_tokens")
+
+
+def annotate(**attrs):
+    """
+    Adds attributes to the span currently open in this thread or task.
+
+    Code that has no tracer of its own (the caches, for example) can use
+    this to mark what happened inside whatever span is timing it. Does
+    nothing when no span is open.
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.attrs.update(attrs)
+
+
+class Span:
+    __slots__ = ("name", "category", "attrs", "start_ns", "end_ns", "thread", "track", "parent")
+
+    def __init__(self, name, category, attrs, parent):
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.parent = parent
+        self.thread = threading.current_thread().name
+        # Spans inherit their parent's track so a session's work stays together
+        self.track = attrs.pop("track", None) or (parent.track if parent else self.thread)
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+
+    @property
+    def duration_ns(self):
+        return (self.end_ns or time.perf_counter_ns()) - self.start_ns
+
+
+class Tracer:
+    """
+    Collects timed spans for one run: iterations, model requests and tool
+    calls, each with free-form attributes such as token counts, bytes moved
+    and cache outcomes.
+
+    Spans are kept in memory and exported at the end of the run as JSON
+    lines, as a Chrome trace (viewable in Perfetto or chrome://tracing) or
+    as a summary table.
+    """
+
+    def __init__(self):
+        self.start_ns = time.perf_counter_ns()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def start(self, name, category, **attrs):
+        """
+        Opens a span and makes it current; close it with finish().
+        """
+        span = Span(name, category, attrs, _current_span.get())
+        token = _current_span.set(span)
+        return span, token
+
+    def finish(self, span, token=None, **attrs):
+        span.attrs.update(attrs)
+        span.end_ns = time.perf_counter_ns()
+        if token is not None:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Finished from a different context than it was started in
+                _current_span.set(span.parent)
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name, category, **attrs):
+        span, token = self.start(name, category, **attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.finish(span, token)
+
+    def wrap_tools(self, function_map):
+        """
+        Returns a copy of function_map whose calls are recorded as "tool"
+        spans with the size of their arguments and result.
+        """
+        wrapped = {}
+        for name, func in function_map.items():
+            wrapped[name] = self._tool_wrapper(name, func)
+        return wrapped
+
+    def _tool_wrapper(self, name, func):
+        def traced(**kwargs):
+            args = {k: v for k, v in kwargs.items() if k != "working_directory"}
+            with self.span(name, "tool", bytes_in=_size(args)) as span:
+                result = func(**kwargs)
+                span.attrs["bytes_out"] = _size(result)
+                if isinstance(result, str) and result.startswith("Error:"):
+                    span.attrs["error"] = result[:200]
+                return result
+
+        return traced
+
+    def _records(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start_ns)
+        ids = {id(span): number for number, span in enumerate(spans, start=1)}
+        for span in spans:
+            record = {
+                "id": ids[id(span)],
+                "parent": ids.get(id(span.parent)),
+                "name": span.name,
+                "category": span.category,
+                "start_ms": round((span.start_ns - self.start_ns) / 1e6, 3),
+                "duration_ms": round(span.duration_ns / 1e6, 3),
+                "thread": span.thread,
+                "track": span.track,
+            }
+            record.update(span.attrs)
+            yield span, record
+
+    def write_jsonl(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            for _, record in self._records():
+                file.write(json.dumps(record, default=str) + "\n")
+
+    def write_chrome_trace(self, path):
+        """
+        Writes the spans in the Chrome trace event format, one track per
+        thread or session.
+        """
+        pid = os.getpid()
+        tracks = {}
+        events = []
+        for span, record in self._records():
+            tid = tracks.setdefault(span.track, len(tracks) + 1)
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": (span.start_ns - self.start_ns) / 1000,
+                    "dur": span.duration_ns / 1000,
+                    "pid": pid,
+                    "tid": tid,
+                    "args": dict(span.attrs),
+                }
+            )
+        for track, tid in tracks.items():
+            events.append(
+                {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": str(track)}}
+            )
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, default=str)
+
+    def summary(self):
+        """
+        Returns a table with calls, wall time, bytes, tokens and cache hits
+        per category and name.
+        """
+        rows = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            row = rows.setdefault(
+                (span.category, span.name),
+                {"calls": 0, "total_ns": 0, "max_ns": 0, "errors": 0, "cache_hits": 0,
+                 **{attr: 0 for attr in SUMMED_ATTRS}},
+            )
+            row["calls"] += 1
+            row["total_ns"] += span.duration_ns
+            row["max_ns"] = max(row["max_ns"], span.duration_ns)
+            row["errors"] += 1 if span.attrs.get("error") else 0
+            row["cache_hits"] += 1 if span.attrs.get("cache") == "hit" else 0
+            for attr in SUMMED_ATTRS:
+                value = span.attrs.get(attr)
+                if isinstance(value, int):
+                    row[attr] += value
+
+        header = (
+            f"{'category':<10} {'name':<24} {'calls':>6} {'total s':>9} {'mean ms':>9} "
+            f"{'max ms':>9} {'bytes in':>10} {'bytes out':>10} {'tok in':>8} "
+            f"{'tok out':>8} {'cached':>6} {'errors':>6}"
+        )
+        lines = [
+            f"Trace summary ({(time.perf_counter_ns() - self.start_ns) / 1e9:.2f}s wall, {len(spans)} spans)",
+            header,
+            "-" * len(header),
+        ]
+        for (category, name), row in sorted(rows.items()):
+            lines.append(
+                f"{category:<10} {name:<24} {row['calls']:>6} "
+                f"{row['total_ns'] / 1e9:>9.3f} {row['total_ns'] / row['calls'] / 1e6:>9.1f} "
+                f"{row['max_ns'] / 1e6:>9.1f} {row['bytes_in']:>10} {row['bytes_out']:>10} "
+                f"{row['prompt_tokens']:>8} {row['output_tokens']:>8} "
+                f"{row['cache_hits']:>6} {row['errors']:>6}"
+            )
+        return "\n".join(lines)
+
+
+def _size(value):
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    try:
+        return len(json.dumps(value, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return len(str(value).encode("utf-8"))
+
+
+def _usage_attrs(usage_metadata):
+    if usage_metadata is None:
+        return {}
+    attrs = {
+        "prompt_tokens": usage_metadata.prompt_token_count,
+        "output_tokens": usage_metadata.candidates_token_count,
+        "cached_tokens": usage_metadata.cached_content_token_count,
+    }
+    return {k: v for k, v in attrs.items() if v is not None}
+
+
+class TracedModels:
+    """
+    Wraps a models object (sync or async) so each request is recorded as
+    a "model" span with its token usage. Streamed requests stay open until
+    the stream is exhausted and also record the time to the first chunk.
+    """
+
+    def __init__(self, models, tracer):
+        self._models = models
+        self.tracer = tracer
+
+    def generate_content(self, *, model, contents, config=None):
+        with self.tracer.span("generate_content", "model", model=model) as span:
+            response = self._models.generate_content(
+                model=model, contents=contents, config=config
+            )
+            span.attrs.update(_usage_attrs(response.usage_metadata))
+            return response
+
+    async def generate_content_stream(self, *, model, contents, config=None):
+        span, token = self.tracer.start("generate_content_stream", "model", model=model)
+        try:
+            stream = await self._models.generate_content_stream(
+                model=model, contents=contents, config=config
+            )
+        except BaseException as e:
+            self.tracer.finish(span, token, error=f"{type(e).__name__}: {e}")
+            raise
+        # Later chunks are consumed by the caller, outside this span's context
+        _current_span.reset(token)
+        return self._traced_stream(span, stream)
+
+    async def _traced_stream(self, span, stream):
+        usage_metadata = None
+        try:
+            async for chunk in stream:
+                if "first_chunk_ms" not in span.attrs:
+                    span.attrs["first_chunk_ms"] = round(span.duration_ns / 1e6, 3)
+                usage_metadata = chunk.usage_metadata or usage_metadata
+                yield chunk
+        except BaseException as e:
+            span.attrs["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.tracer.finish(span, **_usage_attrs(usage_metadata))
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from google.genai import types
+
+
+def call(name, **args):
+    """
+    Returns a model part requesting one function call.
+    """
+    return types.Part(function_call=types.FunctionCall(name=name, args=args))
+
+
+def text(value):
+    return types.Part(text=value)
+
+
+def _estimate_tokens(contents):
+    chars = sum(
+        len(str(part.to_json_dict())) for content in contents for part in content.parts or []
+    )
+    return max(1, chars // 4)
+
+
+def _response(parts, prompt_tokens, output_tokens):
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(content=types.Content(role="model", parts=list(parts)))
+        ],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+        ),
+    )
+
+
+class ScriptedModels:
+    """
+    Stands in for client.models / client.aio.models and replays a fixed
+    script: the n-th request gets the parts of the n-th turn, whatever the
+    conversation contains. Once the script runs out every request gets a
+    final text answer, so the agent loop always terminates.
+
+    Token counts are estimated from the request size so usage metadata is
+    present, and latency_seconds adds a fixed delay per request.
+    """
+
+    def __init__(self, turns, latency_seconds=0.0):
+        self.turns = list(turns)
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+
+    def _next(self, contents):
+        if self.requests < len(self.turns):
+            turn = self.turns[self.requests]
+        else:
+            turn = [text("Done.")]
+        self.requests += 1
+        return turn, _estimate_tokens(contents), _estimate_tokens([types.Content(parts=turn)])
+
+    def generate_content(self, *, model, contents, config=None):
+        parts, prompt_tokens, output_tokens = self._next(contents)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return _response(parts, prompt_tokens, output_tokens)
+
+    async def generate_content_stream(self, *, model, contents, config=None):
+        parts, prompt_tokens, output_tokens = self._next(contents)
+
+        async def stream():
+            # One part per chunk, like a real stream of a multi-call turn
+            for number, part in enumerate(parts, start=1):
+                if self.latency_seconds:
+                    await asyncio.sleep(self.latency_seconds / len(parts))
+                usage = (prompt_tokens, output_tokens) if number == len(parts) else (None, None)
+                yield _response([part], *usage)
+
+        return stream()
+
+
+class FakeClient:
+    """
+    Minimal genai.Client replacement exposing .models and .aio.models.
+    """
+
+    def __init__(self, turns, latency_seconds=0.0):
+        self.models = ScriptedModels(turns, latency_seconds)
+        self.aio = _Aio(self.models)
+
+
+class _Aio:
+    def __init__(self, models):
+        self.models = models
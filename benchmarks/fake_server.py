@@ -0,0 +1,255 @@
+"""
+Local stand-in for the Gemini REST API that injects failures, for
+exercising retries, deadlines and rate limiting without network access.
+
+Run it and point the agent at it:
+    python -m benchmarks.fake_server --port 8765 --fail 429,503 --fail-rate 0.2
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=fake python main.py "hi"
+
+Or use FakeGeminiServer from Python; see check() for an example.
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ERROR_STATUS = {
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+    504: "DEADLINE_EXCEEDED",
+}
+
+
+class FakeGeminiServer:
+    """
+    Serves generateContent and streamGenerateContent.
+
+    Requests first work through the failures queue: an HTTP status to
+    return, or "slow" to stall for slow_seconds. After that each request
+    fails with fail_rate probability and otherwise gets a text answer.
+    429 responses carry retry_after_seconds both as a Retry-After header
+    and as a google.rpc.RetryInfo detail.
+    """
+
+    def __init__(
+        self,
+        port=0,
+        failures=(),
+        fail_rate=0.0,
+        retry_after_seconds=1,
+        slow_seconds=5.0,
+        reply="Done.",
+        seed=0,
+    ):
+        self.failures = list(failures)
+        self.fail_rate = fail_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.slow_seconds = slow_seconds
+        self.reply = reply
+        self.requests = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _next_outcome(self):
+        with self._lock:
+            if self.failures:
+                return self.failures.pop(0)
+            if self.fail_rate and self._random.random() < self.fail_rate:
+                return self._random.choice([429, 503])
+            return None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                outcome = server._next_outcome()
+                with server._lock:
+                    server.requests.append((time.monotonic(), self.path, outcome))
+
+                if outcome == "slow":
+                    time.sleep(server.slow_seconds)
+                    outcome = None
+                if outcome is not None:
+                    return self._send_error(int(outcome))
+
+                answer = {
+                    "candidates": [
+                        {
+                            "content": {"role": "model", "parts": [{"text": server.reply}]},
+                            "finishReason": "STOP",
+                        }
+                    ],
+                    "usageMetadata": {
+                        "promptTokenCount": len(body) // 4,
+                        "candidatesTokenCount": max(1, len(server.reply) // 4),
+                    },
+                }
+                if ":streamGenerateContent" in self.path:
+                    payload = f"data: {json.dumps(answer)}\r\n\r\n".encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                else:
+                    payload = json.dumps(answer).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client timed out waiting for a slow response
+                    pass
+
+            def _send_error(self, status):
+                error = {
+                    "code": status,
+                    "message": f"Injected {status}",
+                    "status": ERROR_STATUS.get(status, "UNKNOWN"),
+                }
+                if status == 429:
+                    error["details"] = [
+                        {
+                            "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                            "retryDelay": f"{server.retry_after_seconds}s",
+                        }
+                    ]
+                payload = json.dumps({"error": error}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if status == 429:
+                    self.send_header("Retry-After", str(server.retry_after_seconds))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def check():
+    """
+    Runs a real genai.Client through RetryingModels against injected
+    failures and prints what happened.
+    """
+    import asyncio
+
+    from google import genai
+    from google.genai import types
+
+    from agent.ratelimit import RateLimiter
+    from agent.retry import DeadlineExceeded, RetryingModels, RetryPolicy, RetryStats
+
+    policy = RetryPolicy(max_retries=3, base_delay=0.05, max_delay=0.5, call_timeout=0.5)
+
+    with FakeGeminiServer(failures=[429, 503, "slow"], retry_after_seconds=0.2, slow_seconds=2) as server:
+        client = genai.Client(api_key="fake", http_options=types.HttpOptions(base_url=server.base_url))
+        stats = RetryStats()
+        models = RetryingModels(client.models, policy, stats=stats)
+        response = models.generate_content(model="gemini-2.0-flash-001", contents="hi")
+        print(f"sync: {response.text!r} after {stats.summary()}")
+
+        server.failures = [503, 503]
+        stats = RetryStats()
+        models = RetryingModels(client.aio.models, policy, stats=stats)
+
+        async def stream():
+            chunks = await models.generate_content_stream(model="gemini-2.0-flash-001", contents="hi")
+            return "".join([chunk.text async for chunk in chunks])
+
+        print(f"stream: {asyncio.run(stream())!r} after {stats.summary()}")
+
+        server.failures = [429] * 5
+        server.retry_after_seconds = 1
+        models = RetryingModels(client.models, policy, session_deadline=0.5)
+        try:
+            models.generate_content(model="gemini-2.0-flash-001", contents="hi")
+            print("deadline: not enforced")
+        except DeadlineExceeded as e:
+            print(f"deadline: {e}")
+
+        server.failures = [429]
+        server.retry_after_seconds = 3600
+        models = RetryingModels(client.models, policy)
+        start = time.monotonic()
+        try:
+            models.generate_content(model="gemini-2.0-flash-001", contents="hi")
+            print("retry-after 3600s: retried")
+        except Exception as e:
+            print(f"retry-after 3600s: gave up after {time.monotonic() - start:.2f}s ({type(e).__name__})")
+
+        server.failures = []
+        stats = RetryStats()
+        limiter = RateLimiter(requests_per_minute=600)
+        models = RetryingModels(client.models, policy, limiter=limiter, stats=stats)
+        start = time.monotonic()
+        for _ in range(5):
+            models.generate_content(model="gemini-2.0-flash-001", contents="hi")
+        print(f"limiter: 5 requests at 600/min took {time.monotonic() - start:.2f}s; {stats.summary()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fake_server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--fail", default="", help="Comma-separated statuses (or 'slow') for the first requests"
+    )
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1)
+    parser.add_argument("--slow-seconds", type=float, default=5.0)
+    parser.add_argument("--check", action="store_true", help="Run the retry self-check and exit")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        check()
+        return 0
+
+    failures = [f if f == "slow" else int(f) for f in args.fail.split(",") if f]
+    server = FakeGeminiServer(
+        port=args.port,
+        failures=failures,
+        fail_rate=args.fail_rate,
+        retry_after_seconds=args.retry_after,
+        slow_seconds=args.slow_seconds,
+    )
+    print(f"Serving a fake Gemini API on {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+Offline benchmarks for the agent loop.
+
+Each scenario replays a scripted sequence of function calls through the
+real main() loop and call_function, against a synthetic working
+directory, with a fake model client in place of the Gemini API. Every run
+happens in a fresh child process so peak RSS and caches are per run.
+
+Usage:
+    python -m benchmarks.run [--size small|medium|large] [--scenario NAME ...]
+        [--repeat N] [--stream] [--latency S]
+        [--save-baseline FILE] [--baseline FILE] [--threshold FRACTION]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.scenarios import SCENARIOS
+from benchmarks.workspace import SIZES, build_workspace
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Metrics compared against a baseline, and the smallest change that counts
+COMPARED_METRICS = {
+    "wall_seconds": 0.005,
+    "iteration_p50_ms": 1.0,
+    "iteration_p90_ms": 1.0,
+    "peak_rss_kb": 4096,
+}
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def run_worker(scenario, size, stream, latency, result_path):
+    """
+    Runs one scenario in this process and writes its measurements as JSON.
+    """
+    root = tempfile.mkdtemp(prefix="agent-bench-")
+    try:
+        # main() always works on ./calculator
+        build_workspace(os.path.join(root, "calculator"), **size)
+        turns = SCENARIOS[scenario](size)
+
+        sys.path.insert(0, REPO_ROOT)
+        import main
+        from benchmarks.fake_model import FakeClient
+
+        fake = FakeClient(turns, latency_seconds=latency)
+        main.client = fake
+        trace_path = os.path.join(root, "trace.jsonl")
+        sys.argv = ["main.py", f"benchmark {scenario}", "--trace", trace_path]
+        if stream:
+            sys.argv.append("--stream")
+
+        os.chdir(root)
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            main.main()
+        wall_seconds = time.perf_counter() - start
+
+        durations = {}
+        with open(trace_path, "r", encoding="utf-8") as file:
+            for line in file:
+                record = json.loads(line)
+                key = f"{record['category']}:{record['name']}"
+                durations.setdefault(key, []).append(record["duration_ms"])
+
+        result = {
+            "wall_seconds": wall_seconds,
+            "model_requests": fake.models.requests,
+            "durations_ms": durations,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "children_peak_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        }
+        with open(result_path, "w", encoding="utf-8") as file:
+            json.dump(result, file)
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def run_scenario(scenario, size, repeat, stream, latency):
+    """
+    Runs a scenario repeat times in child processes and aggregates them.
+    """
+    runs = []
+    for _ in range(repeat):
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as file:
+            result_path = file.name
+        try:
+            command = [
+                sys.executable, "-m", "benchmarks.run",
+                "--worker", scenario,
+                "--size-json", json.dumps(size),
+                "--latency", str(latency),
+                "--result", result_path,
+            ]
+            if stream:
+                command.append("--stream")
+            subprocess.run(command, cwd=REPO_ROOT, check=True)
+            with open(result_path, "r", encoding="utf-8") as file:
+                runs.append(json.load(file))
+        finally:
+            os.remove(result_path)
+
+    durations = {}
+    for run in runs:
+        for key, values in run["durations_ms"].items():
+            durations.setdefault(key, []).extend(values)
+
+    latency_ms = {
+        key: {
+            "count": len(values),
+            "p50": percentile(values, 0.50),
+            "p90": percentile(values, 0.90),
+            "p99": percentile(values, 0.99),
+            "max": max(values),
+        }
+        for key, values in sorted(durations.items())
+    }
+    iterations = durations.get("agent:iteration", [])
+    return {
+        "wall_seconds": sorted(run["wall_seconds"] for run in runs)[len(runs) // 2],
+        "model_requests": runs[0]["model_requests"],
+        "iteration_p50_ms": percentile(iterations, 0.50),
+        "iteration_p90_ms": percentile(iterations, 0.90),
+        "peak_rss_kb": max(run["peak_rss_kb"] for run in runs),
+        "children_peak_rss_kb": max(run["children_peak_rss_kb"] for run in runs),
+        "latency_ms": latency_ms,
+    }
+
+
+def format_results(results):
+    lines = []
+    header = f"  {'span':<34} {'count':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    for scenario, result in results.items():
+        lines.append(
+            f"{scenario}: {result['wall_seconds']:.3f}s wall (median), "
+            f"{result['model_requests']} model requests, "
+            f"peak RSS {result['peak_rss_kb'] / 1024:.1f} MB "
+            f"(children {result['children_peak_rss_kb'] / 1024:.1f} MB)"
+        )
+        lines.append(header)
+        for key, stats in result["latency_ms"].items():
+            lines.append(
+                f"  {key:<34} {stats['count']:>6} {stats['p50']:>9.2f} "
+                f"{stats['p90']:>9.2f} {stats['p99']:>9.2f} {stats['max']:>9.2f}"
+            )
+        lines.append("")
+    return "\n".join(lines)
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns a line per metric that got worse than the baseline by more
+    than threshold (a fraction) and more than the metric's noise floor.
+    """
+    regressions = []
+    for scenario, result in results.items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        for metric, floor in COMPARED_METRICS.items():
+            old, new = previous.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + threshold) and new - old > floor:
+                regressions.append(
+                    f"{scenario} {metric}: {old:.3f} -> {new:.3f} "
+                    f"(+{(new / old - 1) * 100 if old else float('inf'):.0f}%)"
+                )
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Offline benchmarks for the agent loop with a scripted fake model.",
+    )
+    parser.add_argument("--size", choices=sorted(SIZES), default="small")
+    parser.add_argument("--files", type=int, help="Override the number of generated modules")
+    parser.add_argument("--depth", type=int, help="Override the directory depth")
+    parser.add_argument("--big-file-bytes", type=int, help="Override the size of big.txt")
+    parser.add_argument("--chatty-lines", type=int, help="Override the lines chatty.py prints")
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS),
+        help="Scenario to run (repeatable, default all)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming loop")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Simulated seconds per model request"
+    )
+    parser.add_argument("--save-baseline", metavar="FILE")
+    parser.add_argument("--baseline", metavar="FILE")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    # Internal: run a single scenario in this process
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--size-json", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.worker:
+        run_worker(args.worker, json.loads(args.size_json), args.stream, args.latency, args.result)
+        return 0
+
+    size = dict(SIZES[args.size])
+    for key in ("files", "depth", "big_file_bytes", "chatty_lines"):
+        if getattr(args, key) is not None:
+            size[key] = getattr(args, key)
+
+    results = {}
+    for scenario in args.scenario or list(SCENARIOS):
+        results[scenario] = run_scenario(
+            scenario, size, max(1, args.repeat), args.stream, args.latency
+        )
+    print(f"Workspace: {size}, {'streaming' if args.stream else 'sync'} loop\n")
+    print(format_results(results))
+
+    report = {"size": size, "stream": args.stream, "scenarios": results}
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline.get("size") != size or baseline.get("stream") != args.stream:
+            print("Warning: baseline was recorded with a different workspace or loop")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"Regressions over {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions over {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
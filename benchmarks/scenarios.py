@@ -0,0 +1,96 @@
+from benchmarks.fake_model import call, text
+from benchmarks.workspace import module_path
+
+
+def explore_tree(size):
+    """
+    Lists the workspace at increasing depths, then filtered and paged.
+    """
+    return [
+        [call("get_files_info")],
+        [call("get_files_info", max_depth=2)],
+        [call("get_files_info", max_depth=size["depth"] + 1, include=["*.py"])],
+        [call("get_files_info", max_depth=size["depth"] + 1, limit=100, cursor="pkg1")],
+        [text("The workspace is a tree of generated modules.")],
+    ]
+
+
+def read_many(size):
+    """
+    Reads modules one call at a time, in parallel turns and in batches.
+    """
+    paths = [module_path(number, size["depth"]) for number in range(min(size["files"], 40))]
+    return [
+        [call("get_file_content", file_path=path) for path in paths[:10]],
+        [call("get_file_content", file_path=path) for path in paths[:10]],
+        [call("read_files", file_paths=paths)],
+        [call("read_files", pattern="pkg0/**/*.py")],
+        [text("Read the modules.")],
+    ]
+
+
+def page_big_file(size):
+    """
+    Pages through the start and end of big.txt.
+    """
+    limit = 10_000
+    offsets = [0, limit, 2 * limit, max(0, size["big_file_bytes"] - limit)]
+    return [
+        [call("get_file_content", file_path="big.txt", offset=offset, limit=limit)]
+        for offset in offsets
+    ] + [[text("Paged through big.txt.")]]
+
+
+def search(size):
+    """
+    Searches for identifiers and substrings, building the index first.
+    """
+    last = size["files"] - 1
+    return [
+        [call("search_code", query=f"helper_{last}")],
+        [call("search_code", query="Widget1")],
+        [call("search_code", query="total += item", max_results=50)],
+        [call("search_code", query=f"scale_{last // 2}", directory="pkg0")],
+        [text("Found the definitions.")],
+    ]
+
+
+def edit_and_write(size):
+    """
+    Edits modules in place and writes new files next to them.
+    """
+    paths = [module_path(number, size["depth"]) for number in range(min(size["files"], 10))]
+    turns = []
+    for number, path in enumerate(paths):
+        turns.append(
+            [
+                call(
+                    "edit_file",
+                    file_path=path,
+                    edits=[{"search": "total = 0", "replace": f"total = {number}"}],
+                ),
+                call("write_file", file_path=f"generated/new_{number}.py", content=f"X = {number}\n"),
+            ]
+        )
+    return turns + [[text("Edited the modules.")]]
+
+
+def run_chatty_script(size):
+    """
+    Runs a script that prints far more than the output limit.
+    """
+    return [
+        [call("run_python_file", file_path="chatty.py")],
+        [call("run_python_file", file_path="chatty.py", args=["1000"])],
+        [text("The script prints a lot.")],
+    ]
+
+
+SCENARIOS = {
+    "explore_tree": explore_tree,
+    "read_many": read_many,
+    "page_big_file": page_big_file,
+    "search": search,
+    "edit_and_write": edit_and_write,
+    "run_chatty_script": run_chatty_script,
+}
@@ -0,0 +1,89 @@
+"""
+Startup benchmark: wall time of fresh interpreters on the paths that
+should not pay for the SDK import, next to the one that has to.
+
+Usage:
+    python -m benchmarks.startup [--repeat N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Name -> (command arguments after the interpreter, whether it may import the SDK)
+CASES = {
+    "python (empty)": (["-c", "pass"], False),
+    "main.py usage error": (["main.py"], False),
+    "import main": (["-c", "import main"], False),
+    "import one tool": (["-c", "import functions.get_file_content"], False),
+    "load all tools": (["-c", "from functions import registry; registry.load_tools()"], False),
+    "tool declarations": (["-c", "import main; main.available_functions"], True),
+}
+
+SDK_CHECK = "import atexit, sys; atexit.register(lambda: print('google.genai' in sys.modules, file=sys.stderr))"
+
+
+def time_case(arguments, repeat):
+    """
+    Returns the wall times in milliseconds of repeat fresh runs.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *arguments],
+            cwd=REPO_ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def imports_sdk(arguments):
+    """
+    Runs the case once more and reports whether google.genai got imported.
+    """
+    if arguments[0] == "-c":
+        command = [sys.executable, "-c", f"{SDK_CHECK}\n{arguments[1]}"]
+    else:
+        command = [
+            sys.executable, "-c",
+            f"{SDK_CHECK}\nimport runpy, sys\nsys.argv = {arguments!r}\n"
+            f"runpy.run_path({arguments[0]!r}, run_name='__main__')",
+        ]
+    result = subprocess.run(
+        command, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    return result.stderr.strip().splitlines()[-1:] == ["True"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<22} {'median ms':>10} {'min ms':>8} {'SDK loaded':>11}")
+    unexpected = []
+    for name, (arguments, may_import_sdk) in CASES.items():
+        timings = time_case(arguments, max(1, args.repeat))
+        loaded = imports_sdk(arguments)
+        if loaded and not may_import_sdk:
+            unexpected.append(name)
+        print(
+            f"{name:<22} {statistics.median(timings):>10.1f} {min(timings):>8.1f} "
+            f"{'yes' if loaded else 'no':>11}"
+        )
+    if unexpected:
+        print(f"The SDK was imported by: {', '.join(unexpected)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import os
+
+# Workspace presets: (files, depth, big file bytes, chatty script lines)
+SIZES = {
+    "small": {"files": 200, "depth": 3, "big_file_bytes": 1_000_000, "chatty_lines": 10_000},
+    "medium": {"files": 2_000, "depth": 6, "big_file_bytes": 10_000_000, "chatty_lines": 100_000},
+    "large": {"files": 20_000, "depth": 10, "big_file_bytes": 50_000_000, "chatty_lines": 1_000_000},
+}
+
+MODULE_TEMPLATE = '''"""Generated module {number}."""
+
+
+class Widget{number}:
+    def __init__(self, value):
+        self.value = value
+
+    def scale_{number}(self, factor):
+        return Widget{number}(self.value * factor)
+
+
+def helper_{number}(items):
+    total = 0
+    for item in items:
+        total += item
+    return total
+'''
+
+CHATTY_SCRIPT = '''import sys
+
+for number in range(int(sys.argv[1]) if len(sys.argv) > 1 else {lines}):
+    print(f"line {{number}}: the quick brown fox jumps over the lazy dog")
+'''
+
+
+def module_path(number, depth):
+    """
+    Returns the relative path of generated module number, spread over a
+    tree depth directories deep.
+    """
+    parts = [f"pkg{(number >> (2 * level)) % 4}" for level in range(depth)]
+    return os.path.join(*parts, f"module_{number}.py")
+
+
+def build_workspace(root, files, depth, big_file_bytes, chatty_lines):
+    """
+    Creates a synthetic working directory under root.
+
+    It contains files generated Python modules spread over a tree up to
+    depth levels deep, big.txt of big_file_bytes bytes, and chatty.py,
+    which prints chatty_lines lines. Returns the workspace path.
+    """
+    os.makedirs(root, exist_ok=True)
+    for number in range(files):
+        path = os.path.join(root, module_path(number, depth))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(MODULE_TEMPLATE.format(number=number))
+
+    line = "lorem ipsum dolor sit amet, consectetur adipiscing elit\n"
+    with open(os.path.join(root, "big.txt"), "w", encoding="utf-8") as file:
+        chunk = line * (1_000_000 // len(line))
+        written = 0
+        while written < big_file_bytes:
+            data = chunk[: big_file_bytes - written]
+            file.write(data)
+            written += len(data)
+
+    with open(os.path.join(root, "chatty.py"), "w", encoding="utf-8") as file:
+        file.write(CHATTY_SCRIPT.format(lines=chatty_lines))
+    return root
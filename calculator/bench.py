@@ -0,0 +1,286 @@
+# bench.py
+"""
+Benchmarks for the calculator package: Calculator.evaluate on short, long,
+deeply nested and repeated expressions, column batches, render() and the
+--batch line path.
+
+Each case reports operations per second (best of --repeat rounds) and,
+from a separate run under tracemalloc, the peak memory allocated by one
+call and the memory still held after it.
+
+Usage:
+    python bench.py [--case NAME ...] [--repeat N] [--min-time S]
+        [--profile DIR] [--save-baseline FILE] [--baseline FILE]
+        [--threshold FRACTION]
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import random
+import sys
+import timeit
+import tracemalloc
+from array import array
+from pkg.batch import evaluate_lines
+from pkg.calculator import Calculator, _numpy
+from pkg.render import render
+
+# Allocation changes smaller than this are noise, whatever the percentage
+PEAK_KB_FLOOR = 64
+
+
+def make_expressions(count, terms, seed=0):
+    """
+    Returns count distinct random expressions of the given number of terms,
+    mixing precedence levels, parentheses and unary minus.
+    """
+    rng = random.Random(seed)
+    expressions = []
+    for i in range(count):
+        parts = [str(i)]
+        for _ in range(terms - 1):
+            operand = str(rng.randint(1, 99))
+            if rng.random() < 0.2:
+                operand = f"-{operand}"
+            if rng.random() < 0.2:
+                operand = f"({operand} * {rng.randint(1, 9)})"
+            parts.append(rng.choice("+-*/"))
+            parts.append(operand)
+        expressions.append(" ".join(parts))
+    return expressions
+
+
+# Each case returns (function, operations per call of function)
+
+
+def case_short_repeated():
+    calculator = Calculator()
+    expressions = make_expressions(100, 4)
+
+    def run():
+        for expression in expressions:
+            calculator.evaluate(expression)
+
+    return run, len(expressions)
+
+
+def case_short_unique():
+    # No cache: every call tokenizes and compiles
+    calculator = Calculator(cache_size=0)
+    expressions = make_expressions(1000, 4)
+
+    def run():
+        for expression in expressions:
+            calculator.evaluate(expression)
+
+    return run, len(expressions)
+
+
+def case_long():
+    calculator = Calculator(cache_size=0)
+    expression = make_expressions(1, 2000, seed=1)[0]
+    return (lambda: calculator.evaluate(expression)), 1
+
+
+def case_long_variables():
+    # Compiled once; the postfix loop runs over 2000 variable loads
+    calculator = Calculator()
+    expression = " + ".join(f"x{i % 10} * {i % 7 + 1}" for i in range(2000))
+    variables = {f"x{i}": float(i) for i in range(10)}
+    return (lambda: calculator.evaluate(expression, variables)), 1
+
+
+def case_deep_precedence():
+    # Alternating precedence levels keep the operator stack busy
+    calculator = Calculator(cache_size=0)
+    operators = "+*-/"
+    parts = ["1"]
+    for i in range(1000):
+        parts.append(operators[i % 4])
+        parts.append(str(i % 9 + 1))
+    expression = " ".join(parts)
+    return (lambda: calculator.evaluate(expression)), 1
+
+
+def case_nested_parentheses():
+    calculator = Calculator(cache_size=0)
+    expression = "1"
+    for i in range(500):
+        expression = f"({expression} {'+-*/'[i % 4]} {i % 9 + 1})"
+    return (lambda: calculator.evaluate(expression)), 1
+
+
+def case_evaluate_batch():
+    calculator = Calculator()
+    rng = random.Random(2)
+    columns = {
+        "x": array("d", (rng.random() for _ in range(100_000))),
+        "y": array("d", (rng.random() + 1 for _ in range(100_000))),
+    }
+    expression = "(x * 2.5 - y) / (y + 1) + -x * 3"
+    return (lambda: calculator.evaluate_batch(expression, columns)), 100_000
+
+
+def case_render():
+    calculator = Calculator()
+    pairs = [(e, calculator.evaluate(e)) for e in make_expressions(10_000, 4)]
+
+    def run():
+        for expression, result in pairs:
+            render(expression, result)
+
+    return run, len(pairs)
+
+
+def case_batch_lines():
+    # The main.py --batch path for one chunk, boxed output
+    lines = [e + "\n" for e in make_expressions(10_000, 4)]
+    return (lambda: evaluate_lines(lines, 1, "box")), len(lines)
+
+
+CASES = {
+    "short_repeated": case_short_repeated,
+    "short_unique": case_short_unique,
+    "long": case_long,
+    "long_variables": case_long_variables,
+    "deep_precedence": case_deep_precedence,
+    "nested_parentheses": case_nested_parentheses,
+    "evaluate_batch": case_evaluate_batch,
+    "render": case_render,
+    "batch_lines": case_batch_lines,
+}
+
+
+def measure(function, operations, repeat, min_time):
+    """
+    Returns ops/sec (best round), and the peak and retained KB of one call
+    under tracemalloc.
+    """
+    timer = timeit.Timer(function)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / elapsed))
+    best = min(timer.repeat(repeat=repeat, number=number))
+
+    # After the timed runs, so caches are as warm as they were while timed
+    tracemalloc.start()
+    try:
+        result = function()
+        peak = tracemalloc.get_traced_memory()[1]
+        # What the call left behind (caches, leaks), not what it returned
+        del result
+        current = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return {
+        "ops_per_sec": operations * number / best,
+        "peak_kb": peak / 1024,
+        "retained_kb": current / 1024,
+    }
+
+
+def profile(name, function, directory):
+    """
+    Runs one call under cProfile, dumps it to DIRECTORY/<name>.prof and
+    prints the functions with the most internal time.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.prof")
+    profiler = cProfile.Profile()
+    profiler.runcall(function)
+    profiler.dump_stats(path)
+    print(f"\n{name}: profile written to {path}")
+    pstats.Stats(profiler, stream=sys.stdout).sort_stats("tottime").print_stats(8)
+
+
+def format_results(results):
+    lines = [f"{'case':<20} {'ops/sec':>14} {'peak KB':>10} {'retained KB':>12}"]
+    for name, result in results.items():
+        lines.append(
+            f"{name:<20} {result['ops_per_sec']:>14,.0f} "
+            f"{result['peak_kb']:>10.1f} {result['retained_kb']:>12.1f}"
+        )
+    return "\n".join(lines)
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns a line per case that lost more than threshold (a fraction) of
+    its baseline throughput, or whose peak allocation grew by more than
+    threshold and more than PEAK_KB_FLOOR.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get("cases", {}).get(name)
+        if previous is None:
+            continue
+        old, new = previous["ops_per_sec"], result["ops_per_sec"]
+        if new < old * (1 - threshold):
+            regressions.append(
+                f"{name} ops/sec: {old:,.0f} -> {new:,.0f} ({(new / old - 1) * 100:.0f}%)"
+            )
+        old, new = previous["peak_kb"], result["peak_kb"]
+        if new > old * (1 + threshold) and new - old > PEAK_KB_FLOOR:
+            regressions.append(f"{name} peak KB: {old:.1f} -> {new:.1f}")
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python bench.py", description="Benchmarks for the calculator package."
+    )
+    parser.add_argument(
+        "--case", action="append", choices=list(CASES),
+        help="Case to run (repeatable, default all)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Timed rounds per case")
+    parser.add_argument(
+        "--min-time", type=float, default=0.1, help="Minimum seconds per timed round"
+    )
+    parser.add_argument("--profile", metavar="DIR", help="Dump a cProfile per case")
+    parser.add_argument("--save-baseline", metavar="FILE")
+    parser.add_argument("--baseline", metavar="FILE")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    # evaluate_batch results depend on which backend runs them
+    backend = "numpy" if _numpy() else "array"
+
+    results = {}
+    for name in args.case or list(CASES):
+        function, operations = CASES[name]()
+        results[name] = measure(function, operations, max(1, args.repeat), args.min_time)
+        if args.profile:
+            profile(name, function, args.profile)
+    print(f"Python {sys.version.split()[0]}, evaluate_batch backend: {backend}\n")
+    print(format_results(results))
+
+    report = {"python": sys.version.split()[0], "backend": backend, "cases": results}
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline.get("python") != report["python"] or baseline.get("backend") != backend:
+            print("\nWarning: baseline was recorded with a different Python or backend")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions over {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,20 @@
 # main.py
 
+import os
 import sys
 from pkg.calculator import Calculator
 from pkg.render import render
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        sys.exit(main_batch(sys.argv[2:]))
+
     calculator = Calculator()
     if len(sys.argv) <= 1:
         print("Calculator App")
         print('Usage: python main.py "<expression>"')
+        print('       python main.py --batch [FILE] [--format plain|jsonl|box]')
         print('Example: python main.py "3 + 5"')
         return
 
@@ -22,5 +27,47 @@ def main():
         print(f"Error: {e}")
 
 
+def main_batch(argv):
+    """
+    Evaluates one expression per line of a file, or of stdin, and streams
+    the results to stdout in input order. Exits with 1 if any line failed.
+    """
+    import argparse
+    from pkg.batch import DEFAULT_CHUNK_LINES, FORMATS, default_workers, run_batch
+
+    parser = argparse.ArgumentParser(prog="python main.py --batch")
+    parser.add_argument("file", nargs="?", default="-", help="input file, - for stdin")
+    parser.add_argument("--format", choices=FORMATS, default="plain")
+    parser.add_argument(
+        "--workers", type=int, default=default_workers(), help="worker processes"
+    )
+    parser.add_argument(
+        "--chunk-lines",
+        type=int,
+        default=DEFAULT_CHUNK_LINES,
+        help="lines handed to a worker at a time",
+    )
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.chunk_lines < 1:
+        parser.error("--workers and --chunk-lines must be at least 1")
+
+    options = (args.format, args.workers, args.chunk_lines)
+    try:
+        if args.file == "-":
+            errors = run_batch(sys.stdin, sys.stdout, *options)
+        else:
+            with open(args.file, encoding="utf-8") as file:
+                errors = run_batch(file, sys.stdout, *options)
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head): stop quietly, and
+        # keep the interpreter's final flush from failing again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 1 if errors else 0
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,140 @@
+# batch.py
+
+import json
+import os
+from collections import deque
+from itertools import chain, islice
+
+from pkg.calculator import Calculator
+from pkg.render import format_result, render
+
+FORMATS = ("plain", "jsonl", "box")
+DEFAULT_CHUNK_LINES = 2000
+
+# One per process, so each worker keeps its own compiled-expression cache
+_calculator = None
+
+
+def default_workers():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def evaluate_lines(lines, first_line, output_format):
+    """
+    Evaluates a chunk of input lines, numbered from first_line, and returns
+    (output text, number of lines that failed). A failing line is reported
+    in its place in the output instead of stopping the chunk.
+    """
+    global _calculator
+    if _calculator is None:
+        _calculator = Calculator()
+    evaluate = _calculator.evaluate
+
+    output = []
+    errors = 0
+    for number, line in enumerate(lines, first_line):
+        expression = line.strip()
+        if not expression:
+            # Plain output keeps one line per input line
+            if output_format == "plain":
+                output.append("")
+            continue
+        try:
+            result = evaluate(expression)
+            error = None
+        except Exception as e:
+            error = str(e)
+            errors += 1
+
+        if output_format == "jsonl":
+            record = {"line": number, "expression": expression}
+            if error is None:
+                record["result"] = result
+            else:
+                record["error"] = error
+            output.append(json.dumps(record))
+        else:
+            if error is not None:
+                result = f"Error: {error}"
+            if output_format == "box":
+                output.append(render(expression, result))
+            else:
+                output.append(format_result(result))
+
+    if not output:
+        return "", errors
+    return "\n".join(output) + "\n", errors
+
+
+def _chunks(lines, chunk_lines):
+    """
+    Yields (first line number, list of lines), reading lines lazily.
+    """
+    lines = iter(lines)
+    first_line = 1
+    while True:
+        chunk = list(islice(lines, chunk_lines))
+        if not chunk:
+            return
+        yield first_line, chunk
+        first_line += len(chunk)
+
+
+def run_batch(
+    lines,
+    output,
+    output_format="plain",
+    workers=None,
+    chunk_lines=DEFAULT_CHUNK_LINES,
+):
+    """
+    Evaluates every line of lines (any iterable of strings, read lazily)
+    and writes the results to output in input order, one chunk at a time.
+    Returns the number of lines that failed.
+
+    With more than one worker and more than one chunk of input, chunks are
+    evaluated in a process pool. At most two chunks per worker are read
+    ahead of the output, so memory stays flat however long the input is.
+    """
+    if output_format not in FORMATS:
+        raise ValueError(f"unknown output format: {output_format}")
+    workers = workers or default_workers()
+    chunks = _chunks(lines, chunk_lines)
+    head = list(islice(chunks, 2))
+    errors = 0
+
+    def write(result):
+        nonlocal errors
+        text, failed = result
+        output.write(text)
+        output.flush()
+        errors += failed
+
+    if workers == 1 or len(head) < 2:
+        # Not worth starting processes for
+        for first_line, chunk in chain(head, chunks):
+            write(evaluate_lines(chunk, first_line, output_format))
+        return errors
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        try:
+            for first_line, chunk in chain(head, chunks):
+                pending.append(
+                    pool.submit(evaluate_lines, chunk, first_line, output_format)
+                )
+                # Wait for the oldest chunk once the window is full; results
+                # are written in submission order whichever finishes first
+                while len(pending) >= workers * 2:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+    return errors
@@ -1,62 +1,316 @@
 # calculator.py
 
+import operator
+import re
+from array import array
+from functools import cache, lru_cache
+from itertools import repeat
+
+# A compiled expression is a flat postfix tuple: a float is pushed, a str
+# pushes the value of that variable, NEGATE negates the top value and any
+# other item is a binary operator function that replaces the top two
+# values with its result
+NEGATE = operator.neg
+
+SYMBOLS = frozenset("+-*/()")
+NUMBER_START = frozenset("0123456789.")
+
+# Only needed when an exponent's sign would otherwise split a number:
+# numbers with exponents, other runs of non-symbols, and symbols
+EXPONENT_TOKEN_PATTERN = re.compile(
+    r"(?:\d+\.?\d*|\.\d+)[eE][-+]?\d+(?![^-+*/()\s])|[^-+*/()\s]+|\S"
+)
+
+# Stands for unary minus on the operator stack
+UNARY_MINUS = "neg"
+
+
+def tokenize(expression):
+    """
+    Splits an expression into number, variable, operator and parenthesis
+    tokens. Whitespace between tokens is optional; any other run of characters
+    comes out as a token of its own for the compiler to reject.
+    """
+    if "e" in expression or "E" in expression:
+        return EXPONENT_TOKEN_PATTERN.findall(expression)
+    # Spacing out the symbols and splitting is several times faster than
+    # a regular expression scan
+    for symbol in SYMBOLS:
+        expression = expression.replace(symbol, f" {symbol} ")
+    return expression.split()
+
 
 class Calculator:
-    def __init__(self):
+    def __init__(self, cache_size=1024):
         self.operators = {
-            "+": lambda a, b: a + b,
-            "-": lambda a, b: a - b,
-            "*": lambda a, b: a * b,
-            "/": lambda a, b: a / b,
+            "+": operator.add,
+            "-": operator.sub,
+            "*": operator.mul,
+            "/": operator.truediv,
         }
         self.precedence = {
             "+": 1,
             "-": 1,
             "*": 2,
             "/": 2,
+            UNARY_MINUS: 3,
         }
+        # Expression text -> compiled program, least recently used dropped first
+        self.compile = lru_cache(maxsize=cache_size)(self._compile)
+
+    def evaluate(self, expression, variables=None):
+        """
+        Returns the value of expression, taking the values of its variables
+        from the variables mapping.
+        """
+        if not expression or expression.isspace():
+            return None
+        return self.execute(self.compile(expression), variables)
 
-    def evaluate(self, expression):
+    def evaluate_batch(self, expression, columns):
+        """
+        Evaluates expression for every row of columns, a mapping of variable
+        name -> column (NumPy array, array.array or any sequence of numbers),
+        all of the same length. Each operation runs over whole columns at
+        once rather than row by row.
+
+        Returns a float64 NumPy array when NumPy is installed, otherwise an
+        array.array("d"). Like evaluate, raises ZeroDivisionError if any
+        row divides by zero and ValueError for an invalid expression.
+        """
         if not expression or expression.isspace():
             return None
-        tokens = expression.strip().split()
-        return self._evaluate_infix(tokens)
+        program = self.compile(expression)
+        if not columns:
+            raise ValueError("no columns given")
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) != 1:
+            raise ValueError("columns differ in length")
+        for item in program:
+            if item.__class__ is str and item not in columns:
+                raise ValueError(f"undefined variable: {item}")
+
+        numpy = _numpy()
+        if numpy is None:
+            return _execute_arrays(program, columns, lengths.pop())
+        return _execute_numpy(numpy, program, columns, lengths.pop())
 
-    def _evaluate_infix(self, tokens):
-        values = []
+    def _compile(self, expression):
+        """
+        Compiles an infix expression into a postfix program, checking on
+        the way that every operator will find its operands.
+        """
+        return self._compile_infix(tokenize(expression))
+
+    def _compile_infix(self, tokens):
+        program = []
         operators = []
+        precedence = self.precedence
+        depth = 0
+        # True where a "-" can only be unary: at the start, after "(" or
+        # after another operator
+        expect_operand = True
 
         for token in tokens:
-            if token in self.operators:
-                while (
-                    operators
-                    and operators[-1] in self.operators
-                    and self.precedence[operators[-1]] >= self.precedence[token]
-                ):
-                    self._apply_operator(operators, values)
+            if token not in SYMBOLS:
+                # float() would also take "inf", "1_000" and signs
+                if token[0] in NUMBER_START and "_" not in token:
+                    try:
+                        program.append(float(token))
+                    except ValueError:
+                        raise ValueError(f"invalid token: {token}") from None
+                elif token.isidentifier():
+                    program.append(token)
+                else:
+                    raise ValueError(f"invalid token: {token}")
+                depth += 1
+                expect_operand = False
+            elif token == "(":
                 operators.append(token)
+                expect_operand = True
+            elif token == ")":
+                while operators and operators[-1] != "(":
+                    depth = self._apply_operator(operators, program, depth)
+                if not operators:
+                    raise ValueError("unbalanced parentheses")
+                operators.pop()
+                expect_operand = False
+            elif token == "-" and expect_operand:
+                # Unary minus binds tighter than any binary operator and
+                # to the right, so there is nothing to pop before it
+                operators.append(UNARY_MINUS)
             else:
-                try:
-                    values.append(float(token))
-                except ValueError:
-                    raise ValueError(f"invalid token: {token}")
+                rank = precedence[token]
+                while operators and precedence.get(operators[-1], 0) >= rank:
+                    depth = self._apply_operator(operators, program, depth)
+                operators.append(token)
+                expect_operand = True
 
         while operators:
-            self._apply_operator(operators, values)
+            if operators[-1] == "(":
+                raise ValueError("unbalanced parentheses")
+            depth = self._apply_operator(operators, program, depth)
 
-        if len(values) != 1:
+        if depth != 1:
             raise ValueError("invalid expression")
 
-        return values[0]
+        return tuple(program)
 
-    def _apply_operator(self, operators, values):
+    def _apply_operator(self, operators, program, depth):
+        """
+        Pops an operator and emits its instruction; returns the depth of
+        the value stack after it runs.
+        """
         if not operators:
-            return
+            return depth
 
         operator = operators.pop()
-        if len(values) < 2:
+        if operator == UNARY_MINUS:
+            if depth < 1:
+                raise ValueError("not enough operands for operator -")
+            if program[-1].__class__ is float:
+                # Fold negative literals into the constant
+                program[-1] = -program[-1]
+            else:
+                program.append(NEGATE)
+            return depth
+
+        if depth < 2:
             raise ValueError(f"not enough operands for operator {operator}")
+        function = self.operators[operator]
+        if program[-1].__class__ is float and program[-2].__class__ is float:
+            # Both operands are constants: fold them now
+            b = program.pop()
+            program[-1] = function(program[-1], b)
+        else:
+            program.append(function)
+        return depth - 1
+
+    def execute(self, program, variables=None):
+        """
+        Runs a compiled program and returns its value. The compiler has
+        already checked the stack depth, so nothing is checked here.
+        """
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        try:
+            for item in program:
+                if item.__class__ is float:
+                    push(item)
+                elif item.__class__ is str:
+                    push(variables[item])
+                elif item is NEGATE:
+                    stack[-1] = -stack[-1]
+                else:
+                    b = pop()
+                    stack[-1] = item(stack[-1], b)
+        except (KeyError, TypeError):
+            for item in program:
+                if item.__class__ is str and item not in (variables or {}):
+                    raise ValueError(f"undefined variable: {item}") from None
+            raise
+        return stack[0]
+
+
+@cache
+def _numpy():
+    """
+    Returns the numpy module, or None if it isn't installed. Imported on
+    first use so the single-expression CLI doesn't pay for it.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _division_by_zero(row):
+    return ZeroDivisionError(f"float division by zero (row {row})")
+
+
+def _execute_numpy(numpy, program, columns, length):
+    """
+    Runs a program over float64 arrays. Results of earlier operations are
+    overwritten in place, so a long expression allocates about as many
+    arrays as its deepest subexpression rather than one per operation.
+    """
+    ufuncs = {
+        operator.add: numpy.add,
+        operator.sub: numpy.subtract,
+        operator.mul: numpy.multiply,
+        operator.truediv: numpy.divide,
+    }
+    # Columns converted to float64, once each
+    arrays = {}
+    stack = []
+    # Whether each stack entry is a temporary that may be overwritten
+    owned = []
+    for item in program:
+        if item.__class__ is float:
+            stack.append(item)
+            owned.append(False)
+        elif item.__class__ is str:
+            if item not in arrays:
+                arrays[item] = numpy.asarray(columns[item], dtype=numpy.float64)
+            stack.append(arrays[item])
+            owned.append(False)
+        elif item is NEGATE:
+            out = stack[-1] if owned[-1] else None
+            stack[-1] = numpy.negative(stack[-1], out=out)
+            owned[-1] = True
+        else:
+            b = stack.pop()
+            b_owned = owned.pop()
+            a = stack[-1]
+            if item is operator.truediv:
+                zero = numpy.broadcast_to(b == 0, (length,))
+                if zero.any():
+                    raise _division_by_zero(int(zero.argmax()))
+            if owned[-1]:
+                out = a
+            elif b_owned:
+                out = b
+            else:
+                out = None
+            stack[-1] = ufuncs[item](a, b, out=out)
+            owned[-1] = True
+
+    if owned[0]:
+        return stack[0]
+    # A constant, or a column passed straight through: return a new array
+    return numpy.array(numpy.broadcast_to(stack[0], (length,)), dtype=numpy.float64)
+
+
+def _execute_arrays(program, columns, length):
+    """
+    Runs a program one whole column per operation, with map() applying the
+    operator in C, into array.array("d") columns.
+    """
+
+    def column(value):
+        return repeat(value, length) if value.__class__ is float else value
+
+    stack = []
+    for item in program:
+        if item.__class__ is float:
+            stack.append(item)
+        elif item.__class__ is str:
+            stack.append(columns[item])
+        elif item is NEGATE:
+            stack[-1] = array("d", map(NEGATE, stack[-1]))
+        else:
+            b = stack.pop()
+            try:
+                stack[-1] = array("d", map(item, column(stack[-1]), column(b)))
+            except ZeroDivisionError:
+                row = 0 if b.__class__ is float else next(
+                    i for i, value in enumerate(b) if value == 0
+                )
+                raise _division_by_zero(row) from None
 
-        b = values.pop()
-        a = values.pop()
-        values.append(self.operators[operator](a, b))
+    result = stack[0]
+    if any(result is value for value in columns.values()):
+        return array("d", result)
+    return array("d", column(result)) if result.__class__ is float else result
@@ -1,7 +1,12 @@
 # tests.py
 
+import io
+import json
 import unittest
-from pkg.calculator import Calculator
+from array import array
+from unittest import mock
+from pkg.batch import run_batch
+from pkg.calculator import Calculator, _numpy, tokenize
 
 
 class TestCalculator(unittest.TestCase):
@@ -44,6 +49,133 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.calculator.evaluate("+ 3")
 
+    def test_no_whitespace(self):
+        result = self.calculator.evaluate("3+5*2")
+        self.assertEqual(result, 13)
+
+    def test_parentheses(self):
+        result = self.calculator.evaluate("(3 + 5) * (2 - 4)")
+        self.assertEqual(result, -16)
+
+    def test_unary_minus(self):
+        self.assertEqual(self.calculator.evaluate("-3 + 5"), 2)
+        self.assertEqual(self.calculator.evaluate("2 * -3"), -6)
+        self.assertEqual(self.calculator.evaluate("2 - -3"), 5)
+        self.assertEqual(self.calculator.evaluate("-(2 + 3) * 2"), -10)
+
+    def test_exponent_literals(self):
+        result = self.calculator.evaluate("1e-3*2+1.5E+2")
+        self.assertEqual(result, 150.002)
+
+    def test_unbalanced_parentheses(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("(3 + 5")
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("3 + 5)")
+
+    def test_invalid_number(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("1.2.3 + 4")
+
+    def test_division_by_zero(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.calculator.evaluate("1 / (2 - 2)")
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("2*(3+-4)"), ["2", "*", "(", "3", "+", "-", "4", ")"])
+        self.assertEqual(tokenize("1e-3 - 2"), ["1e-3", "-", "2"])
+
+    def test_constants_are_folded(self):
+        self.assertEqual(self.calculator.compile("2 * (3 + 4)"), (14.0,))
+
+    def test_compiled_programs_are_cached(self):
+        calculator = Calculator(cache_size=2)
+        program = calculator.compile("1 + 2")
+        self.assertIs(calculator.compile("1 + 2"), program)
+        calculator.compile("3 + 4")
+        calculator.compile("5 + 6")
+        self.assertIsNot(calculator.compile("1 + 2"), program)
+        self.assertEqual(calculator.compile.cache_info().currsize, 2)
+
+    def test_variables(self):
+        result = self.calculator.evaluate("rate * (x + 1)", {"rate": 2, "x": 3})
+        self.assertEqual(result, 8)
+
+    def test_undefined_variable(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("x + 1", {"y": 2})
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("x + 1")
+
+
+class TestEvaluateBatch(unittest.TestCase):
+    def setUp(self):
+        self.calculator = Calculator()
+        self.columns = {"x": array("d", [1, 2, 3, 4]), "y": [1, 0.5, 2, 4]}
+
+    def check_batch(self):
+        expression = "-(x + 1) * 2 / (y - 3)"
+        result = self.calculator.evaluate_batch(expression, self.columns)
+        expected = [
+            self.calculator.evaluate(expression, {"x": x, "y": y})
+            for x, y in zip(self.columns["x"], self.columns["y"])
+        ]
+        self.assertEqual(list(result), expected)
+        constant = self.calculator.evaluate_batch("2 * 3", self.columns)
+        self.assertEqual(list(constant), [6] * 4)
+        column = self.calculator.evaluate_batch("x", self.columns)
+        self.assertEqual(list(column), [1, 2, 3, 4])
+        with self.assertRaises(ZeroDivisionError):
+            self.calculator.evaluate_batch("x / (y - 2)", self.columns)
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_batch("x + z", self.columns)
+        return result
+
+    def test_without_numpy(self):
+        with mock.patch("pkg.calculator._numpy", return_value=None):
+            result = self.check_batch()
+        self.assertIsInstance(result, array)
+
+    @unittest.skipUnless(_numpy(), "NumPy is not installed")
+    def test_with_numpy(self):
+        numpy = _numpy()
+        self.columns["y"] = numpy.array(self.columns["y"])
+        result = self.check_batch()
+        self.assertIsInstance(result, numpy.ndarray)
+
+    def test_columns_differ_in_length(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_batch("x + y", {"x": [1, 2], "y": [1]})
+
+
+class TestBatch(unittest.TestCase):
+    def run_lines(self, lines, output_format="plain", **kwargs):
+        output = io.StringIO()
+        errors = run_batch(lines, output, output_format, **kwargs)
+        return output.getvalue(), errors
+
+    def test_plain(self):
+        output, errors = self.run_lines(["3 + 5\n", "\n", "1 / 0\n", "2.5\n"])
+        self.assertEqual(output, "8\n\nError: float division by zero\n2.5\n")
+        self.assertEqual(errors, 1)
+
+    def test_jsonl(self):
+        output, errors = self.run_lines(["3 + 5", "$"], "jsonl")
+        records = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(records[0], {"line": 1, "expression": "3 + 5", "result": 8})
+        self.assertEqual(records[1]["line"], 2)
+        self.assertIn("error", records[1])
+
+    def test_box(self):
+        output, _ = self.run_lines(["3 + 5"], "box")
+        self.assertIn("│  8", output)
+
+    def test_workers_keep_input_order(self):
+        lines = [f"{i} * 2" for i in range(500)]
+        output, errors = self.run_lines(lines, workers=2, chunk_lines=7)
+        self.assertEqual(output.split(), [str(i * 2) for i in range(500)])
+        self.assertEqual(errors, 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,39 @@
+import os
+import uuid
+
+
+def atomic_write(full_path, content, dir_fd=None):
+    """
+    Writes text to full_path so readers see either the old or the new file.
+
+    The content goes to a temporary file in the same directory, which is
+    fsynced and then renamed over the target with os.replace. An existing
+    file keeps its permission bits; a new one gets the usual umask-based mode.
+    With dir_fd, an open descriptor of the target's directory, every step
+    works on names relative to it instead of on paths.
+    """
+    name = os.path.basename(full_path)
+    tmp_name = f".{name}.{uuid.uuid4().hex[:8]}.tmp"
+    if dir_fd is None:
+        dir_path = os.path.dirname(full_path) or "."
+        name, tmp_name = full_path, os.path.join(dir_path, tmp_name)
+    try:
+        mode = os.stat(name, dir_fd=dir_fd).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = None
+
+    fd = os.open(tmp_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666, dir_fd=dir_fd)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(content.encode("utf-8"))
+            file.flush()
+            os.fsync(file.fileno())
+        if mode is not None:
+            os.chmod(tmp_name, mode, dir_fd=dir_fd)
+        os.replace(tmp_name, name, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+    except BaseException:
+        try:
+            os.remove(tmp_name, dir_fd=dir_fd)
+        except OSError:
+            pass
+        raise
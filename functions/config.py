@@ -1 +1,47 @@
+import os
+
+# Directory the tools work in; every path the model gives is relative to it
+WORKING_DIRECTORY = "./calculator"
+
 MAX_FILE_SIZE_CHARS = 10000
+MAX_LIST_ENTRIES = 1000
+# read_files shares one character budget between all files it returns
+MAX_BATCH_FILES = 50
+MAX_BATCH_READ_CHARS = 30000
+
+# Agent-side caches live outside the working directory
+AGENT_CACHE_DIR = ".agent_cache"
+
+INDEX_DIR = os.path.join(AGENT_CACHE_DIR, "index")
+# The agent's own writes and runs update the index as they happen; this
+# safety-net rescan only catches edits made outside it
+INDEX_REFRESH_SECONDS = 600
+MAX_INDEX_FILE_BYTES = 1_000_000
+# Index databases kept on disk, least recently opened dropped first
+MAX_INDEXES = 20
+MAX_SEARCH_RESULTS = 100
+
+# run_python_file limits; the memory cap is an RLIMIT_AS on the child
+RUN_TIMEOUT_SECONDS = 30
+RUN_OUTPUT_HEAD_BYTES = 8000
+RUN_OUTPUT_TAIL_BYTES = 8000
+RUN_CPU_LIMIT_SECONDS = None
+RUN_MEMORY_LIMIT_BYTES = None
+# Mirror child output to the agent's terminal while it runs (--verbose)
+RUN_STREAM_OUTPUT = False
+
+# run_tests discovery, result cache and report size; tests run under the
+# run_python_file limits above
+TEST_FILE_PATTERNS = ["test*.py", "*_test.py"]
+TEST_CACHE_DIR = os.path.join(AGENT_CACHE_DIR, "tests")
+MAX_TEST_TRACEBACK_CHARS = 4000
+MAX_TEST_FAILURES_REPORTED = 20
+
+# Modules each warm pool interpreter imports before it is handed a script
+PYTHON_POOL_PRELOAD = [
+    "argparse",
+    "collections",
+    "json",
+    "re",
+    "unittest",
+]
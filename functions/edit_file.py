@@ -0,0 +1,243 @@
+import os
+import re
+import sqlite3
+from functions import sandbox
+from functions.atomic_write import atomic_write
+from functions.search_code import notify_file_written
+
+HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class EditError(ValueError):
+    pass
+
+
+def edit_file(working_directory, file_path, edits=None, diff=None):
+    """
+    Applies search/replace edits or a unified diff to an existing file,
+    constrained to the working directory.
+
+    All edits are applied in memory first; if any of them does not match
+    the current file nothing is written. The result is written atomically.
+    """
+    try:
+        full_path = sandbox.resolve(working_directory, file_path)
+    except sandbox.OutsideSandbox:
+        return f'Error: Cannot edit "{file_path}" as it is outside the permitted working directory'
+    except (TypeError, ValueError, OSError) as e:
+        return f"Error: Invalid path arguments - {str(e)}"
+
+    if (edits is None) == (diff is None):
+        return "Error: Provide exactly one of 'edits' or 'diff'"
+
+    try:
+        with sandbox.open_file(
+            working_directory, full_path, 'r', encoding='utf-8', newline=''
+        ) as file:
+            original = file.read()
+    except sandbox.OutsideSandbox:
+        # A symlink on the path was changed since it was resolved
+        return f'Error: Cannot edit "{file_path}" as it is outside the permitted working directory'
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return f"Error: {file_path} is not a file or does not exist"
+    except PermissionError:
+        return f"Error: Permission denied reading {file_path}"
+    except UnicodeDecodeError:
+        return f"Error: Cannot decode {file_path} as UTF-8 text"
+    except OSError as e:
+        return f"Error: Cannot read file {file_path} - {str(e)}"
+
+    try:
+        if edits is not None:
+            content, count = apply_search_replace(original, edits)
+        else:
+            content, count = apply_unified_diff(original, diff)
+    except EditError as e:
+        return f"Error: Cannot edit {file_path} - {str(e)}. The file was not changed."
+
+    try:
+        dir_fd = sandbox.open_dir(working_directory, os.path.dirname(full_path))
+        try:
+            atomic_write(full_path, content, dir_fd=dir_fd)
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+        try:
+            notify_file_written(working_directory, full_path)
+        except sqlite3.Error:
+            pass
+        return (
+            f"Successfully applied {count} edit(s) to {file_path} "
+            f"({len(original)} -> {len(content)} characters)"
+        )
+    except sandbox.OutsideSandbox:
+        return f'Error: Cannot edit "{file_path}" as it is outside the permitted working directory'
+    except PermissionError:
+        return f"Error: Permission denied writing to {file_path}"
+    except OSError as e:
+        return f"Error: Cannot write to file {file_path} - {str(e)}"
+
+
+def apply_search_replace(content, edits):
+    """
+    Applies edits in order; each search text must occur exactly once.
+    """
+    if not isinstance(edits, list) or not edits:
+        raise EditError("'edits' must be a non-empty list")
+    for number, edit in enumerate(edits, start=1):
+        search = edit.get("search") if isinstance(edit, dict) else None
+        replace = edit.get("replace", "") if isinstance(edit, dict) else None
+        if not isinstance(search, str) or not search or not isinstance(replace, str):
+            raise EditError(f"edit {number} needs a non-empty 'search' and a 'replace' string")
+        occurrences = content.count(search)
+        if occurrences == 0:
+            raise EditError(f"search text of edit {number} was not found")
+        if occurrences > 1:
+            raise EditError(
+                f"search text of edit {number} matches {occurrences} places; "
+                "include more surrounding lines to make it unique"
+            )
+        content = content.replace(search, replace, 1)
+    return content, len(edits)
+
+
+def _parse_hunks(diff):
+    hunks = []
+    current = None
+    last_sides = ()
+    for line in diff.splitlines():
+        header = HUNK_HEADER_RE.match(line)
+        if header:
+            current = {"start": int(header.group(1)), "old": [], "new": []}
+            hunks.append(current)
+            continue
+        if current is None:
+            # File headers (diff --git, ---, +++) before the first hunk
+            continue
+        if line.startswith("\\"):
+            # "\ No newline at end of file" applies to the previous line
+            for side in last_sides:
+                if current[side]:
+                    current[side][-1] = current[side][-1].rstrip("\n")
+            continue
+        tag, text = (line[:1], line[1:]) if line else (" ", "")
+        if tag == " ":
+            last_sides = ("old", "new")
+        elif tag == "-":
+            last_sides = ("old",)
+        elif tag == "+":
+            last_sides = ("new",)
+        else:
+            raise EditError(f"unexpected line in hunk {len(hunks)}: {line[:40]!r}")
+        for side in last_sides:
+            current[side].append(text + "\n")
+    if not hunks:
+        raise EditError("the diff contains no @@ hunks")
+    return hunks
+
+
+def _strip_eol(line):
+    return line.rstrip("\r\n")
+
+
+def _find_block(lines, block, expected):
+    """
+    Returns where block starts in lines: at the expected index if it
+    matches there, otherwise at its only occurrence in the file.
+    """
+    wanted = [_strip_eol(line) for line in block]
+    size = len(wanted)
+
+    def matches(index):
+        return [_strip_eol(line) for line in lines[index : index + size]] == wanted
+
+    if 0 <= expected <= len(lines) - size and matches(expected):
+        return expected
+    found = [i for i in range(len(lines) - size + 1) if matches(i)]
+    return found[0] if len(found) == 1 else None
+
+
+def apply_unified_diff(content, diff):
+    """
+    Applies the hunks of a unified diff; context and removed lines must
+    match the current file exactly.
+    """
+    if not isinstance(diff, str) or not diff.strip():
+        raise EditError("'diff' must be a non-empty unified diff")
+    lines = content.splitlines(keepends=True)
+    newline = "\r\n" if lines and lines[0].endswith("\r\n") else "\n"
+
+    offset = 0
+    for number, hunk in enumerate(_parse_hunks(diff), start=1):
+        expected = max(hunk["start"] - 1, 0) + offset
+        if hunk["old"]:
+            index = _find_block(lines, hunk["old"], expected)
+            if index is None:
+                raise EditError(
+                    f"hunk {number} does not match the current file contents"
+                )
+        else:
+            # "@@ -N,0 ..." inserts after line N
+            index = min(hunk["start"] + offset, len(lines))
+
+        new_lines = [
+            line if not line.endswith("\n") else _strip_eol(line) + newline
+            for line in hunk["new"]
+        ]
+        # Keep a missing final newline if the hunk's last old line had none
+        if hunk["old"] and index + len(hunk["old"]) == len(lines):
+            if not lines[-1].endswith("\n") and new_lines and hunk["old"][-1].endswith("\n"):
+                new_lines[-1] = _strip_eol(new_lines[-1])
+        lines[index : index + len(hunk["old"])] = new_lines
+        offset += len(new_lines) - len(hunk["old"])
+    return "".join(lines), number
+
+
+# Function declaration (schema) for "edit_file"
+schema_edit_file = {
+    "name": "edit_file",
+    "description": (
+        "Edits an existing file without rewriting it in full, either with exact "
+        "search/replace edits or with a unified diff. Nothing is written if any "
+        "edit does not match the current file. Constrained to the working directory."
+    ),
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "file_path": {
+                "type": "STRING",
+                "description": (
+                    "The path to the file to edit, relative to the working directory."
+                ),
+            },
+            "edits": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "search": {
+                            "type": "STRING",
+                            "description": "Exact text to find; must occur exactly once.",
+                        },
+                        "replace": {
+                            "type": "STRING",
+                            "description": "Text to put in its place.",
+                        },
+                    },
+                    "required": ["search", "replace"],
+                },
+                "description": (
+                    "Search/replace edits applied in order. Use either this or 'diff'."
+                ),
+            },
+            "diff": {
+                "type": "STRING",
+                "description": (
+                    "A unified diff (with @@ hunk headers) against the current file. "
+                    "Use either this or 'edits'."
+                ),
+            },
+        },
+        "required": ["file_path"],
+    },
+}
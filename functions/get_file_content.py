@@ -1,39 +1,79 @@
+import codecs
 import os
-from google.genai import types
+from functions import config, sandbox
 
+# Longest UTF-8 encoding of one character
+MAX_CHAR_BYTES = 4
 
-def get_file_content(working_directory, file_path):
+
+def get_file_content(working_directory, file_path, offset=0, limit=None):
     """
     Reads and returns the contents of a file, constrained to the working directory.
-    """
-    try:
-        abs_working_dir = os.path.abspath(working_directory)
-        full_path = os.path.abspath(os.path.join(working_directory, file_path))
 
-        if not (
-            full_path == abs_working_dir
-            or full_path.startswith(abs_working_dir + os.sep)
-        ):
-            return f'Error: Cannot read "{file_path}" as it is outside the permitted working directory'
+    Only the requested range is read from disk: at most `limit` characters
+    (capped at config.MAX_FILE_SIZE_CHARS) starting at byte `offset`. When the
+    result does not cover the whole file, a trailer reports the byte range
+    shown, the total size and the offset to continue from.
 
-    except (TypeError, ValueError, OSError) as e:
-        return f"Error: Invalid path arguments - {str(e)}"
+    Like a file opened in text mode, "\r\n" and lone "\r" line endings come
+    back as "\n"; offsets and limits count bytes and characters as above
+    after that translation, and a page never ends between "\r" and "\n".
+    """
+    try:
+        offset = int(offset or 0)
+        max_chars = config.MAX_FILE_SIZE_CHARS
+        limit = max_chars if limit is None else min(int(limit), max_chars)
+        if offset < 0 or limit < 1:
+            raise ValueError("offset must be >= 0 and limit must be >= 1")
+    except (TypeError, ValueError) as e:
+        return f"Error: Invalid range arguments - {str(e)}"
 
+    # Opened under the working directory's descriptor; where the file
+    # really is gets checked once it is open
     try:
-        if not os.path.isfile(full_path):
-            return f"Error: {file_path} is not a file or does not exist"
-    except (PermissionError, OSError) as e:
+        file = sandbox.open_file(working_directory, file_path)
+    except sandbox.OutsideSandbox:
+        return f'Error: Cannot read "{file_path}" as it is outside the permitted working directory'
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return f"Error: {file_path} is not a file or does not exist"
+    except PermissionError:
+        return f"Error: Permission denied reading {file_path}"
+    except OSError as e:
         return f"Error: Cannot access {file_path} - {str(e)}"
+    except (TypeError, ValueError) as e:
+        return f"Error: Invalid path arguments - {str(e)}"
 
     try:
-        with open(full_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        # Truncate content if it exceeds 10,000 characters
-        if len(content) > 10000:
-            content = content[:10000] + "\n... (truncated)"
-        
-        return content
+        with file:
+            total_size = os.fstat(file.fileno()).st_size
+            file.seek(offset)
+            raw = file.read(limit * MAX_CHAR_BYTES)
+
+        # Skip the tail of a character split by the offset
+        skipped = 0
+        while (
+            skipped < min(len(raw), MAX_CHAR_BYTES - 1)
+            and 0x80 <= raw[skipped] < 0xC0
+        ):
+            skipped += 1
+        start = offset + skipped
+        raw = raw[skipped:]
+
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        final = start + len(raw) >= total_size
+        text = decoder.decode(raw, final=final)
+        cut = _translated_cut(text, limit, final)
+        content = _translate_newlines(text[:cut])
+        end = start + len(text[:cut].encode('utf-8'))
+
+        if start == 0 and end >= total_size:
+            return content
+        if end < total_size:
+            return content + (
+                f"\n... (truncated: showing bytes {start}-{end} of {total_size}; "
+                f"call again with offset={end} to continue)"
+            )
+        return content + f"\n... (showing bytes {start}-{end} of {total_size})"
     except PermissionError:
         return f"Error: Permission denied reading {file_path}"
     except UnicodeDecodeError:
@@ -42,23 +82,64 @@ def get_file_content(working_directory, file_path):
         return f"Error: Cannot read file {file_path} - {str(e)}"
 
 
+def _translate_newlines(text):
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _translated_cut(text, limit, final):
+    """
+    Returns how many characters of text make up `limit` characters once
+    newlines are translated, without splitting a "\r\n" pair.
+    """
+    cut = limit
+    while cut < len(text):
+        piece = text[:cut]
+        missing = limit - (len(piece) - piece.count("\r\n"))
+        if missing <= 0:
+            break
+        cut += missing
+    cut = min(cut, len(text))
+    if text[cut - 1 : cut] == "\r":
+        if text[cut : cut + 1] == "\n":
+            cut += 1
+        elif cut == len(text) and not final and cut > 1:
+            # The "\n" may be the next byte in the file
+            cut -= 1
+    return cut
+
+
 # Function declaration (schema) for "get_file_content"
-schema_get_file_content = types.FunctionDeclaration(
-    name="get_file_content",
-    description=(
-        "Reads and returns the contents of a file, "
-        "constrained to the working directory."
+schema_get_file_content = {
+    "name": "get_file_content",
+    "description": (
+        "Reads and returns the contents of a file, constrained to the working "
+        "directory. Large files are returned in pages of up to "
+        f"{config.MAX_FILE_SIZE_CHARS} characters."
     ),
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description=(
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "file_path": {
+                "type": "STRING",
+                "description": (
                     "The path to the file to read, relative to the working directory."
                 ),
-            ),
+            },
+            "offset": {
+                "type": "INTEGER",
+                "description": (
+                    "Optional byte offset to start reading from. Use the offset "
+                    "reported at the end of a truncated result to read the next part."
+                ),
+            },
+            "limit": {
+                "type": "INTEGER",
+                "description": (
+                    "Optional maximum number of characters to return, "
+                    f"capped at {config.MAX_FILE_SIZE_CHARS}."
+                ),
+            },
         },
-        required=["file_path"],
-    ),
-)
\ No newline at end of file
+        "required": ["file_path"],
+    },
+}
\ No newline at end of file
@@ -1,20 +1,33 @@
+import fnmatch
 import os
-from google.genai import types
+from functions import config, sandbox
 
 
-def get_files_info(working_directory, directory="."):
+def get_files_info(
+    working_directory,
+    directory=".",
+    max_depth=1,
+    include=None,
+    exclude=None,
+    limit=None,
+    cursor=None,
+):
+    """
+    Lists a directory, constrained to the working directory.
+
+    Entries come from os.scandir so each file costs at most one stat call.
+    The listing is sorted and walks up to max_depth levels. include/exclude
+    glob patterns are matched against each entry's relative path and name;
+    excluded directories are not descended into. At most `limit` entries
+    (capped at config.MAX_LIST_ENTRIES) are returned, and a truncated listing
+    ends with a cursor to pass back to continue after the last entry shown.
+    """
     print(f"Result for '{directory}' directory:")
 
     try:
-        abs_working_dir = os.path.abspath(working_directory)
-        full_path = os.path.abspath(os.path.join(working_directory, directory))
-
-        if not (
-            full_path == abs_working_dir
-            or full_path.startswith(abs_working_dir + os.sep)
-        ):
-            return f'Error: Cannot list "{directory}" as it is outside the permitted working directory'
-
+        full_path = sandbox.resolve(working_directory, directory)
+    except sandbox.OutsideSandbox:
+        return f'Error: Cannot list "{directory}" as it is outside the permitted working directory'
     except (TypeError, ValueError, OSError) as e:
         return f"Error: Invalid path arguments - {str(e)}"
 
@@ -24,9 +37,20 @@ def get_files_info(working_directory, directory="."):
     except (PermissionError, OSError) as e:
         return f"Error: Cannot access {directory} - {str(e)}"
 
-    file_info = ""
     try:
-        files = os.listdir(full_path)
+        max_depth = int(max_depth or 1)
+        max_entries = config.MAX_LIST_ENTRIES
+        limit = max_entries if limit is None else min(int(limit), max_entries)
+        if max_depth < 1 or limit < 1:
+            raise ValueError("max_depth and limit must be >= 1")
+        include = [include] if isinstance(include, str) else list(include or [])
+        exclude = [exclude] if isinstance(exclude, str) else list(exclude or [])
+        after = tuple(cursor.split("/")) if cursor else ()
+    except (TypeError, ValueError, AttributeError) as e:
+        return f"Error: Invalid listing arguments - {str(e)}"
+
+    try:
+        top_entries = _sorted_entries(full_path)
     except PermissionError:
         return f"Error: Permission denied accessing {directory}"
     except FileNotFoundError:
@@ -34,42 +58,123 @@ def get_files_info(working_directory, directory="."):
     except OSError as e:
         return f"Error: Cannot list directory {directory} contents - {str(e)}"
 
-    for file in files:
-        if file.startswith(".") or file == "__pycache__":
+    lines = []
+    last_shown = None
+    # Pre-order walk over sorted names, so a cursor path also orders entries:
+    # each stack item is (entry iterator, relative parts of its dir, depth)
+    stack = [(iter(top_entries), (), 1)]
+    while stack:
+        entries, parent_parts, depth = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        if entry.name.startswith(".") or entry.name == "__pycache__":
+            continue
+
+        parts = parent_parts + (entry.name,)
+        if parts <= after and after[: len(parts)] != parts:
+            # Entry and everything below it were returned by an earlier page
+            continue
+        rel_path = "/".join(parts)
+        if exclude and _matches(rel_path, entry.name, exclude):
             continue
 
         try:
-            file_path = os.path.join(full_path, file)
-            if os.path.isfile(file_path):
-                file_info += f"- {file}: file_size={os.path.getsize(file_path)} bytes, is_dir=False\n"
-            elif os.path.isdir(file_path):
-                file_info += f"- {file}: file_size=N/A bytes, is_dir=True\n"
+            is_dir = entry.is_dir()
+            shown = parts > after and (
+                not include or _matches(rel_path, entry.name, include)
+            )
+            if shown and len(lines) == limit:
+                lines.append(
+                    f"... (listing truncated after {limit} entries; "
+                    f"call again with cursor=\"{last_shown}\" to continue)\n"
+                )
+                break
+            if shown and is_dir:
+                lines.append(f"- {rel_path}: file_size=N/A bytes, is_dir=True\n")
+                last_shown = rel_path
+            elif shown and entry.is_file():
+                lines.append(
+                    f"- {rel_path}: file_size={entry.stat().st_size} bytes, is_dir=False\n"
+                )
+                last_shown = rel_path
+
+            if is_dir and depth < max_depth and not entry.is_symlink():
+                stack.append((iter(_sorted_entries(entry.path)), parts, depth + 1))
 
         except PermissionError:
-            file_info += f"- {file}: Error - Permission denied\n"
+            lines.append(f"- {rel_path}: Error - Permission denied\n")
         except OSError as e:
-            file_info += f"- {file}: Error - {str(e)}\n"
+            lines.append(f"- {rel_path}: Error - {str(e)}\n")
 
-    return file_info
+    return "".join(lines)
+
+
+def _sorted_entries(path):
+    with os.scandir(path) as it:
+        return sorted(it, key=lambda entry: entry.name)
+
+
+def _matches(rel_path, name, patterns):
+    return any(
+        fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(name, pattern)
+        for pattern in patterns
+    )
 
 
 # Function declaration (schema) for "get_files_info"
-schema_get_files_info = types.FunctionDeclaration(
-    name="get_files_info",
-    description=(
+schema_get_files_info = {
+    "name": "get_files_info",
+    "description": (
         "Lists files in the specified directory along with their sizes, "
         "constrained to the working directory."
     ),
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "directory": types.Schema(
-                type=types.Type.STRING,
-                description=(
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "directory": {
+                "type": "STRING",
+                "description": (
                     "The directory to list files from, relative to the working directory. "
                     "If not provided, lists files in the working directory itself."
                 ),
-            ),
+            },
+            "max_depth": {
+                "type": "INTEGER",
+                "description": (
+                    "Optional number of levels to list. 1 (the default) lists only "
+                    "the directory itself; larger values include subdirectories, "
+                    "with paths shown relative to the listed directory."
+                ),
+            },
+            "include": {
+                "type": "ARRAY",
+                "items": {"type": "STRING"},
+                "description": (
+                    "Optional glob patterns (e.g. '*.py'); only matching entries are listed."
+                ),
+            },
+            "exclude": {
+                "type": "ARRAY",
+                "items": {"type": "STRING"},
+                "description": (
+                    "Optional glob patterns to skip; excluded directories are not descended into."
+                ),
+            },
+            "limit": {
+                "type": "INTEGER",
+                "description": (
+                    "Optional maximum number of entries to return, "
+                    f"capped at {config.MAX_LIST_ENTRIES}."
+                ),
+            },
+            "cursor": {
+                "type": "STRING",
+                "description": (
+                    "Optional cursor from a truncated listing; continues after that entry."
+                ),
+            },
         },
-    ),
-)
+    },
+}
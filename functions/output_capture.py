@@ -0,0 +1,157 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+READ_CHUNK_BYTES = 65536
+
+
+class BoundedBuffer:
+    """
+    Keeps the first head_bytes and the last tail_bytes written to it and
+    counts everything in between, so memory stays bounded however much a
+    child process prints.
+    """
+
+    def __init__(self, head_bytes, tail_bytes):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, data):
+        self.total += len(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data and self.tail_bytes > 0:
+            self.tail += data[-self.tail_bytes :]
+            if len(self.tail) > self.tail_bytes:
+                del self.tail[: len(self.tail) - self.tail_bytes]
+
+    @property
+    def dropped(self):
+        return self.total - len(self.head) - len(self.tail)
+
+    def text(self):
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if self.dropped:
+            return f"{head}\n... ({self.dropped} bytes omitted) ...\n{tail}"
+        return head + tail
+
+
+def apply_limits(process, cpu_seconds=None, memory_bytes=None):
+    """
+    Applies RLIMIT_CPU / RLIMIT_AS caps to a started child process.
+
+    Uses prlimit so no preexec_fn runs in our threaded process; platforms
+    without it run the child uncapped. If a limit cannot be applied, the
+    child is killed and reaped before the error is raised.
+    """
+    if resource is None or not hasattr(resource, "prlimit"):
+        return
+    try:
+        if cpu_seconds:
+            resource.prlimit(process.pid, resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+        if memory_bytes:
+            resource.prlimit(process.pid, resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    except BaseException:
+        kill(process)
+        process.wait()
+        raise
+
+
+def kill(process):
+    """
+    Kills a child and everything it started. Children are started with
+    start_new_session=True, so their process group id is their pid.
+    """
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    if process.poll() is None:
+        process.kill()
+
+
+def capture(process, timeout, head_bytes, tail_bytes, on_output=None):
+    """
+    Reads a child's stdout and stderr incrementally into BoundedBuffers.
+
+    Args:
+        process: subprocess.Popen with stdout and stderr pipes
+        timeout: Seconds to wait before killing the child
+        head_bytes: Bytes kept from the start of each stream
+        tail_bytes: Bytes kept from the end of each stream
+        on_output: Optional callback(stream_name, data) for live output
+
+    Returns:
+        (stdout BoundedBuffer, stderr BoundedBuffer, returncode)
+
+    Raises:
+        subprocess.TimeoutExpired after killing the child's process group,
+        also when the child exited in time but something it started still
+        holds its output pipes open at the deadline
+    """
+    deadline = time.monotonic() + timeout
+    buffers = {
+        "stdout": BoundedBuffer(head_bytes, tail_bytes),
+        "stderr": BoundedBuffer(head_bytes, tail_bytes),
+    }
+
+    def drain(name, pipe):
+        fd = pipe.fileno()
+        while True:
+            data = os.read(fd, READ_CHUNK_BYTES)
+            if not data:
+                break
+            buffers[name].write(data)
+            if on_output:
+                on_output(name, data)
+        pipe.close()
+
+    readers = [
+        threading.Thread(target=drain, args=(name, pipe), daemon=True)
+        for name, pipe in (("stdout", process.stdout), ("stderr", process.stderr))
+    ]
+    for reader in readers:
+        reader.start()
+
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        kill(process)
+        process.wait()
+        for reader in readers:
+            reader.join(timeout=1)
+        raise
+    for reader in readers:
+        reader.join(timeout=max(deadline - time.monotonic(), 0))
+    if any(reader.is_alive() for reader in readers):
+        # A grandchild still holds the pipes
+        kill(process)
+        for reader in readers:
+            reader.join(timeout=1)
+        raise subprocess.TimeoutExpired(process.args, timeout)
+
+    return buffers["stdout"], buffers["stderr"], process.returncode
+
+
+def echo_output(name, data):
+    """
+    on_output callback that mirrors child output to our own streams.
+    """
+    stream = sys.stdout if name == "stdout" else sys.stderr
+    stream.write(data.decode("utf-8", errors="replace"))
+    stream.flush()
@@ -0,0 +1,116 @@
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+from functions import config
+
+# Runs inside a pool worker: imports the preload modules, then blocks until
+# the parent sends one job on stdin and runs it as a regular script would be.
+_BOOTSTRAP = """
+import importlib, json, os, runpy, sys
+for name in sys.argv[1:]:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+line = sys.stdin.readline()
+if not line:
+    sys.exit(0)
+job = json.loads(line)
+devnull = os.open(os.devnull, os.O_RDONLY)
+os.dup2(devnull, 0)
+os.chdir(job["cwd"])
+sys.argv = [job["path"]] + job["args"]
+sys.path[0] = os.path.dirname(job["path"])
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+class WarmPythonPool:
+    """
+    Keeps `size` idle interpreters ready to run one script each.
+
+    Each worker has already started up and imported config.PYTHON_POOL_PRELOAD,
+    so a run only pays for the script itself. A worker runs exactly one script
+    and exits, and a replacement is started in the background, so imports and
+    module state never carry over from one run to the next.
+    """
+
+    def __init__(self, size=2, preload=None):
+        self.size = size
+        self.preload = list(config.PYTHON_POOL_PRELOAD if preload is None else preload)
+        self._idle = queue.Queue()
+        self._closed = False
+        for _ in range(size):
+            self._spawn_in_background()
+
+    def _spawn(self):
+        return subprocess.Popen(
+            [sys.executable, "-c", _BOOTSTRAP, *self.preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+
+    def _spawn_in_background(self):
+        def spawn():
+            if not self._closed:
+                self._idle.put(self._spawn())
+
+        threading.Thread(target=spawn, daemon=True).start()
+
+    def take_worker(self):
+        """
+        Returns an idle worker and starts its replacement.
+        """
+        self._spawn_in_background()
+        while True:
+            try:
+                process = self._idle.get_nowait()
+            except queue.Empty:
+                return self._spawn()
+            if process.poll() is None:
+                return process
+            self._spawn_in_background()
+
+    def start(self, full_path, args, cwd):
+        """
+        Hands a script to a warm worker and returns its Popen object, which
+        behaves like one from subprocess.Popen([sys.executable, full_path]).
+        """
+        process = self.take_worker()
+        job = {"path": full_path, "args": list(args or []), "cwd": os.path.abspath(cwd)}
+        process.stdin.write((json.dumps(job) + "\n").encode("utf-8"))
+        process.stdin.close()
+        process.stdin = None
+        return process
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                process = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            process.kill()
+            process.wait()
+
+
+_pool = None
+
+
+def enable(size=2):
+    """
+    Starts the warm pool used by run_python_file for the rest of the process.
+    """
+    global _pool
+    if _pool is None:
+        _pool = WarmPythonPool(size)
+    return _pool
+
+
+def get_pool():
+    return _pool
@@ -0,0 +1,133 @@
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functions import config, sandbox
+from functions.get_file_content import get_file_content
+
+
+def read_files(working_directory, file_paths=None, pattern=None):
+    """
+    Reads several files concurrently under one shared character budget,
+    constrained to the working directory.
+
+    Every file is read through get_file_content, so each path gets the same
+    working directory check and truncation trailer. Small files are given
+    their full size and the remaining budget is split evenly between the
+    larger ones.
+    """
+    if file_paths is None and pattern is None:
+        return "Error: Provide 'file_paths' or 'pattern'"
+
+    paths = []
+    if file_paths is not None:
+        if not isinstance(file_paths, list) or not all(
+            isinstance(path, str) for path in file_paths
+        ):
+            return "Error: 'file_paths' must be a list of strings"
+        paths.extend(file_paths)
+
+    if pattern is not None:
+        if not isinstance(pattern, str) or not pattern:
+            return "Error: 'pattern' must be a non-empty string"
+        if os.path.isabs(pattern) or os.pardir in pattern.replace("\\", "/").split("/"):
+            return f'Error: Cannot read "{pattern}" as it is outside the permitted working directory'
+        try:
+            abs_working_dir = sandbox.get_root(working_directory).path
+            matches = glob.glob(pattern, root_dir=abs_working_dir, recursive=True)
+        except (TypeError, ValueError, OSError) as e:
+            return f"Error: Invalid pattern - {str(e)}"
+        paths.extend(
+            path for path in sorted(matches) if _is_file_inside(working_directory, path)
+        )
+
+    # Keep the first occurrence of each path
+    paths = list(dict.fromkeys(paths))
+    skipped = max(0, len(paths) - config.MAX_BATCH_FILES)
+    paths = paths[: config.MAX_BATCH_FILES]
+    if not paths:
+        return "Error: No files matched"
+
+    limits = _split_budget(working_directory, paths, config.MAX_BATCH_READ_CHARS)
+    with ThreadPoolExecutor(max_workers=min(8, len(paths))) as executor:
+        contents = list(
+            executor.map(
+                lambda item: get_file_content(working_directory, item[0], limit=item[1]),
+                zip(paths, limits),
+            )
+        )
+
+    files = []
+    for path, content in zip(paths, contents):
+        if content.startswith("Error:"):
+            files.append({"path": path, "error": content})
+        else:
+            files.append({"path": path, "content": content})
+    result = {"files": files, "budget_chars": config.MAX_BATCH_READ_CHARS}
+    if skipped:
+        result["skipped_files"] = skipped
+    return result
+
+
+def _is_file_inside(working_directory, path):
+    """
+    Whether a glob match is a regular file that, symlinks resolved, stays
+    inside the working directory. Matches outside are left out silently.
+    """
+    try:
+        return os.path.isfile(sandbox.resolve(working_directory, path))
+    except (TypeError, ValueError, OSError):
+        return False
+
+
+def _split_budget(working_directory, paths, budget):
+    """
+    Returns a character limit per path that shares budget between them.
+    """
+    sizes = []
+    for path in paths:
+        try:
+            sizes.append(os.path.getsize(sandbox.resolve(working_directory, path)))
+        except (TypeError, ValueError, OSError):
+            # Including paths outside the working directory
+            sizes.append(0)
+
+    limits = [0] * len(paths)
+    remaining = budget
+    pending = sorted(range(len(paths)), key=lambda i: sizes[i])
+    while pending:
+        share = max(1, remaining // len(pending))
+        index = pending.pop(0)
+        limits[index] = max(1, min(sizes[index], share))
+        remaining = max(0, remaining - limits[index])
+    return limits
+
+
+# Function declaration (schema) for "read_files"
+schema_read_files = {
+    "name": "read_files",
+    "description": (
+        "Reads several files at once and returns their contents together, "
+        "constrained to the working directory. The files share a budget of "
+        f"{config.MAX_BATCH_READ_CHARS} characters; files cut short end with "
+        "a truncation note giving the offset to continue from with get_file_content."
+    ),
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "file_paths": {
+                "type": "ARRAY",
+                "items": {"type": "STRING"},
+                "description": (
+                    "Paths of the files to read, relative to the working directory."
+                ),
+            },
+            "pattern": {
+                "type": "STRING",
+                "description": (
+                    "Optional glob pattern relative to the working directory, "
+                    "e.g. 'pkg/*.py' or '**/*.py'."
+                ),
+            },
+        },
+    },
+}
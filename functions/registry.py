@@ -0,0 +1,51 @@
+import importlib
+from functools import cache
+
+# Tool name -> module defining the tool function and its schema_<name> dict.
+# Tool modules don't import the SDK; it is only imported once the
+# declarations are first needed for a model request.
+TOOL_MODULES = {
+    "get_files_info": "functions.get_files_info",
+    "get_file_content": "functions.get_file_content",
+    "run_python_file": "functions.run_python_file",
+    "write_file": "functions.write_file",
+    "search_code": "functions.search_code",
+    "edit_file": "functions.edit_file",
+    "read_files": "functions.read_files",
+    "run_tests": "functions.run_tests",
+}
+
+
+def _module(name):
+    return importlib.import_module(TOOL_MODULES[name])
+
+
+def load_tools(names=None):
+    """
+    Imports the registered tools (or just names) and returns a dict of
+    tool name -> function.
+    """
+    return {name: getattr(_module(name), name) for name in (names or TOOL_MODULES)}
+
+
+def get_schema(name):
+    """
+    Returns the plain-dict schema of one tool.
+    """
+    return getattr(_module(name), f"schema_{name}")
+
+
+@cache
+def tool_declarations(names=None):
+    """
+    Returns a types.Tool declaring every registered tool (or just names,
+    a tuple), built once on first use.
+    """
+    from google.genai import types
+
+    return types.Tool(
+        function_declarations=[
+            types.FunctionDeclaration.model_validate(get_schema(name))
+            for name in (names or TOOL_MODULES)
+        ]
+    )
@@ -1,7 +1,9 @@
 import os
+import sqlite3
 import subprocess
 import sys
-from google.genai import types
+from functions import config, output_capture, python_pool, sandbox
+from functions.search_code import notify_tree_changed
 
 
 def run_python_file(working_directory, file_path, args=None):
@@ -9,15 +11,9 @@ def run_python_file(working_directory, file_path, args=None):
     Executes a Python file with optional arguments, constrained to the working directory.
     """
     try:
-        abs_working_dir = os.path.abspath(working_directory)
-        full_path = os.path.abspath(os.path.join(working_directory, file_path))
-
-        if not (
-            full_path == abs_working_dir
-            or full_path.startswith(abs_working_dir + os.sep)
-        ):
-            return f'Error: Cannot run "{file_path}" as it is outside the permitted working directory'
-
+        full_path = sandbox.resolve(working_directory, file_path)
+    except sandbox.OutsideSandbox:
+        return f'Error: Cannot run "{file_path}" as it is outside the permitted working directory'
     except (TypeError, ValueError, OSError) as e:
         return f"Error: Invalid path arguments - {str(e)}"
 
@@ -31,62 +27,86 @@ def run_python_file(working_directory, file_path, args=None):
         return f"Error: {file_path} is not a Python file"
 
     try:
-        # Prepare command
-        cmd = [sys.executable, full_path]
-        if args:
-            cmd.extend(args)
+        pool = python_pool.get_pool()
+        if pool is not None:
+            # Run in a pre-warmed interpreter instead of starting a new one
+            process = pool.start(full_path, args or [], working_directory)
+        else:
+            # Prepare command
+            cmd = [sys.executable, full_path]
+            if args:
+                cmd.extend(args)
+
+            process = subprocess.Popen(
+                cmd,
+                cwd=working_directory,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+            )
 
-        # Run the Python file
-        result = subprocess.run(
-            cmd,
-            cwd=working_directory,
-            capture_output=True,
-            text=True,
-            timeout=30  # 30 second timeout
+        output_capture.apply_limits(
+            process, config.RUN_CPU_LIMIT_SECONDS, config.RUN_MEMORY_LIMIT_BYTES
         )
+        # Output is read as it is produced; only the head and tail are kept
+        stdout, stderr, returncode = output_capture.capture(
+            process,
+            timeout=config.RUN_TIMEOUT_SECONDS,
+            head_bytes=config.RUN_OUTPUT_HEAD_BYTES,
+            tail_bytes=config.RUN_OUTPUT_TAIL_BYTES,
+            on_output=output_capture.echo_output if config.RUN_STREAM_OUTPUT else None,
+        )
+        stdout, stderr = stdout.text(), stderr.text()
 
         output = ""
-        if result.stdout:
-            output += f"STDOUT:\n{result.stdout}\n"
-        if result.stderr:
-            output += f"STDERR:\n{result.stderr}\n"
-        if result.returncode != 0:
-            output += f"Exit code: {result.returncode}\n"
+        if stdout:
+            output += f"STDOUT:\n{stdout}\n"
+        if stderr:
+            output += f"STDERR:\n{stderr}\n"
+        if returncode != 0:
+            output += f"Exit code: {returncode}\n"
 
         return output.strip() if output else "Script executed successfully with no output"
 
     except subprocess.TimeoutExpired:
-        return f"Error: Script {file_path} timed out after 30 seconds"
+        return f"Error: Script {file_path} timed out after {config.RUN_TIMEOUT_SECONDS} seconds"
     except PermissionError:
         return f"Error: Permission denied executing {file_path}"
     except OSError as e:
         return f"Error: Cannot execute file {file_path} - {str(e)}"
+    finally:
+        # The script may have written anywhere in the working directory
+        try:
+            notify_tree_changed(working_directory)
+        except (sqlite3.Error, OSError):
+            # The index is only a cache; never lose the run's result over it
+            pass
 
 
 # Function declaration (schema) for "run_python_file"
-schema_run_python_file = types.FunctionDeclaration(
-    name="run_python_file",
-    description=(
+schema_run_python_file = {
+    "name": "run_python_file",
+    "description": (
         "Executes a Python file with optional arguments, "
         "constrained to the working directory."
     ),
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description=(
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "file_path": {
+                "type": "STRING",
+                "description": (
                     "The path to the Python file to execute, relative to the working directory."
                 ),
-            ),
-            "args": types.Schema(
-                type=types.Type.ARRAY,
-                items=types.Schema(type=types.Type.STRING),
-                description=(
+            },
+            "args": {
+                "type": "ARRAY",
+                "items": {"type": "STRING"},
+                "description": (
                     "Optional list of command-line arguments to pass to the Python script."
                 ),
-            ),
+            },
         },
-        required=["file_path"],
-    ),
-)
\ No newline at end of file
+        "required": ["file_path"],
+    },
+}
\ No newline at end of file
@@ -0,0 +1,385 @@
+import fnmatch
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+from functions import config, output_capture, python_pool, sandbox
+from functions.atomic_write import atomic_write
+from functions.search_code import notify_tree_changed
+
+RUNNER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_runner.py")
+
+_cache_lock = threading.Lock()
+
+
+def run_tests(working_directory, tests=None, force=False):
+    """
+    Discovers and runs the unittest and pytest-style tests of the working
+    directory in a child interpreter, and returns structured results.
+
+    tests selects test files ("tests.py"), modules, classes or single
+    tests ("tests.TestCalculator.test_addition", "test_addition").
+    A test module is skipped when its last run passed everything selected
+    now and neither it nor any workspace module it imported has changed
+    since, judged by content hash. force=True runs everything.
+    """
+    try:
+        root = sandbox.resolve(working_directory)
+    except sandbox.OutsideSandbox:
+        return 'Error: Cannot run tests in "." as it is outside the permitted working directory'
+    except (TypeError, ValueError, OSError) as e:
+        return f"Error: Invalid path arguments - {str(e)}"
+
+    if tests is not None and (
+        not isinstance(tests, list) or not all(isinstance(t, str) and t for t in tests)
+    ):
+        return "Error: 'tests' must be a list of non-empty strings"
+
+    try:
+        plan = _plan(working_directory, root, tests)
+    except sandbox.OutsideSandbox as e:
+        return f'Error: Cannot run "{e}" as it is outside the permitted working directory'
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    if not plan:
+        return "Error: No test files found"
+
+    with _cache_lock:
+        cache = _load_cache(root)
+    to_run = []
+    cached = []
+    # Dependency states re-stamped with new mtimes while checking
+    refreshed = {}
+    for path, select in plan.items():
+        entry = None if force else cache["modules"].get(path)
+        if entry and _deps_unchanged(root, entry["deps"]):
+            refreshed[path] = entry["deps"]
+            wanted = [t for t in entry["tests"] if _selected(t, select)]
+            if wanted and set(wanted) <= set(entry["passed"]):
+                cached.append({"path": path, "tests": len(wanted)})
+                continue
+        to_run.append({"path": path, "select": sorted(select) if select else None})
+
+    reports = []
+    if to_run:
+        reports, error = _run_child(working_directory, to_run)
+        if error:
+            return error
+
+    with _cache_lock:
+        # Reloaded in case another run saved meanwhile; what this run
+        # learned is merged into it
+        cache = _load_cache(root)
+        _merge_refreshed(cache, refreshed)
+        for report in reports:
+            _update_entry(root, cache, report)
+        try:
+            _save_cache(root, cache)
+        except OSError:
+            pass
+
+    # No wall time in the result: it would make every response differ, and
+    # the tool's span in the trace already records it
+    return _summarize(reports, cached, tests)
+
+
+def _discover(root):
+    """
+    Returns the paths, relative to root, of files matching
+    config.TEST_FILE_PATTERNS, skipping hidden directories and __pycache__.
+    """
+    found = []
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names[:] = sorted(
+            d for d in dir_names if not d.startswith(".") and d != "__pycache__"
+        )
+        for name in sorted(file_names):
+            if any(fnmatch.fnmatch(name, p) for p in config.TEST_FILE_PATTERNS):
+                found.append(os.path.relpath(os.path.join(dir_path, name), root))
+    return found
+
+
+def _plan(working_directory, root, selectors):
+    """
+    Returns {test file: set of selectors, or None for every test}.
+
+    A selector naming a file, or a dotted name starting with a module
+    path, picks that file; a bare test or class name is looked for in
+    every discovered test file.
+    """
+    if not selectors:
+        return {path: None for path in _discover(root)}
+
+    plan = {}
+
+    def add(path, selector):
+        if path in plan and plan[path] is None:
+            return
+        if selector is None:
+            plan[path] = None
+        else:
+            plan.setdefault(path, set()).add(selector)
+
+    for selector in selectors:
+        # pytest-style "tests.py::TestCalculator::test_addition"
+        file_part, _, name_part = selector.partition("::")
+        if file_part.endswith(".py"):
+            full_path = sandbox.resolve(working_directory, file_part)
+            if not os.path.isfile(full_path):
+                raise ValueError(f"Test file {file_part} not found")
+            path = os.path.relpath(full_path, root)
+            name = os.path.splitext(path)[0].replace(os.sep, ".")
+            add(path, f"{name}.{name_part.replace('::', '.')}" if name_part else None)
+            continue
+
+        parts = selector.split(".")
+        for end in range(len(parts), 0, -1):
+            # Through the sandbox first, so a selector can't probe for
+            # files outside the working directory
+            candidate = sandbox.resolve(working_directory, os.path.join(*parts[:end]) + ".py")
+            if os.path.isfile(candidate):
+                add(os.path.relpath(candidate, root), selector if end < len(parts) else None)
+                break
+        else:
+            for path in _discover(root):
+                add(path, selector)
+    return plan
+
+
+def _selected(test_id, selectors):
+    if not selectors:
+        return True
+    dotted = f".{test_id}."
+    return any(
+        test_id == s or test_id.startswith(s + ".") or f".{s}." in dotted
+        for s in selectors
+    )
+
+
+def _run_child(working_directory, modules):
+    """
+    Runs the test runner on modules and returns (reports, None), or
+    (None, error string) if it did not finish.
+    """
+    fd, result_path = tempfile.mkstemp(prefix="run_tests.", suffix=".json")
+    os.close(fd)
+    job = json.dumps(
+        {
+            "modules": modules,
+            "result_path": result_path,
+            "max_traceback_chars": config.MAX_TEST_TRACEBACK_CHARS,
+        }
+    )
+    try:
+        pool = python_pool.get_pool()
+        if pool is not None:
+            process = pool.start(RUNNER_PATH, [job], working_directory)
+        else:
+            process = subprocess.Popen(
+                [sys.executable, RUNNER_PATH, job],
+                cwd=working_directory,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+            )
+        output_capture.apply_limits(
+            process, config.RUN_CPU_LIMIT_SECONDS, config.RUN_MEMORY_LIMIT_BYTES
+        )
+        _, stderr, returncode = output_capture.capture(
+            process,
+            timeout=config.RUN_TIMEOUT_SECONDS,
+            head_bytes=config.RUN_OUTPUT_HEAD_BYTES,
+            tail_bytes=config.RUN_OUTPUT_TAIL_BYTES,
+        )
+        with open(result_path, "r", encoding="utf-8") as file:
+            text = file.read()
+        reports = json.loads(text) if text else []
+        if returncode != 0 or len(reports) < len(modules):
+            done = ", ".join(report["path"] for report in reports) or "none"
+            return None, (
+                f"Error: Test run exited with code {returncode} "
+                f"(modules finished: {done})\nSTDERR:\n{stderr.text()}"
+            )
+        return reports, None
+    except subprocess.TimeoutExpired:
+        return None, f"Error: Tests timed out after {config.RUN_TIMEOUT_SECONDS} seconds"
+    except (OSError, ValueError) as e:
+        return None, f"Error: Cannot run tests - {str(e)}"
+    finally:
+        # Tests may have written files anywhere in the working directory
+        try:
+            notify_tree_changed(working_directory)
+        except (sqlite3.Error, OSError):
+            # The index is only a cache; never lose the run's result over it
+            pass
+        try:
+            os.remove(result_path)
+        except OSError:
+            pass
+
+
+def _cache_path(root):
+    digest = hashlib.sha256(root.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(config.TEST_CACHE_DIR, f"{digest}.json")
+
+
+def _load_cache(root):
+    empty = {"python": sys.version, "modules": {}}
+    try:
+        with open(_cache_path(root), "r", encoding="utf-8") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return empty
+    # A different interpreter may change what passes
+    if not isinstance(cache, dict) or cache.get("python") != sys.version:
+        return empty
+    return cache
+
+
+def _save_cache(root, cache):
+    os.makedirs(config.TEST_CACHE_DIR, exist_ok=True)
+    atomic_write(_cache_path(root), json.dumps(cache))
+
+
+def _file_state(root, path, known=None):
+    """
+    Returns [mtime_ns, size, sha256] of a workspace file, or None if it is
+    gone. The file is only hashed if its mtime or size differ from known.
+    """
+    try:
+        stat = os.stat(os.path.join(root, path))
+    except OSError:
+        return None
+    if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+        return known
+    try:
+        with open(os.path.join(root, path), "rb") as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size, digest]
+
+
+def _deps_unchanged(root, deps):
+    for path, known in deps.items():
+        state = _file_state(root, path, known)
+        if state is None or state[2] != known[2]:
+            return False
+        # Touched but identical: remember the new mtime to skip rehashing
+        known[:] = state
+    return True
+
+
+def _merge_refreshed(cache, refreshed):
+    """
+    Copies re-stamped dependency states into cache, where the file is
+    still recorded with the same hash.
+    """
+    for path, deps in refreshed.items():
+        entry = cache["modules"].get(path)
+        if not entry:
+            continue
+        for dep, state in deps.items():
+            known = entry["deps"].get(dep)
+            if known and known[2] == state[2]:
+                entry["deps"][dep] = state
+
+
+def _update_entry(root, cache, report):
+    """
+    Records which tests of a module passed against the current hashes of
+    the files it imported.
+    """
+    old = cache["modules"].get(report["path"])
+    deps = {}
+    for path in set(report["deps"]) | {report["path"]}:
+        state = _file_state(root, path)
+        if state is not None:
+            deps[path] = state
+
+    passed = set()
+    if old and {p: s[2] for p, s in old["deps"].items()} == {
+        p: s[2] for p, s in deps.items()
+    }:
+        passed = set(old["passed"])
+    for record in report["records"]:
+        if record["status"] == "pass":
+            passed.add(record["test"])
+        else:
+            passed.discard(record["test"].split(" ")[0])
+    cache["modules"][report["path"]] = {
+        "deps": deps,
+        "tests": report["tests"],
+        "passed": sorted(passed & set(report["tests"])),
+    }
+
+
+def _summarize(reports, cached, selectors):
+    counts = {"passed": 0, "failed": 0, "errors": 0, "skipped": 0}
+    failures = []
+    for report in reports:
+        for record in report["records"]:
+            status = record["status"]
+            if status == "pass":
+                counts["passed"] += 1
+            elif status == "skip":
+                counts["skipped"] += 1
+            else:
+                counts["failed" if status == "fail" else "errors"] += 1
+                failures.append(record)
+
+    ran = sum(counts.values())
+    cached_tests = sum(item["tests"] for item in cached)
+    if selectors and not ran and not cached_tests:
+        return f"Error: No tests matched {', '.join(selectors)}"
+
+    result = {
+        "status": "failed" if failures else "passed",
+        **counts,
+        "cached_passed": cached_tests,
+    }
+    if failures:
+        shown = failures[: config.MAX_TEST_FAILURES_REPORTED]
+        result["failures"] = shown
+        if len(failures) > len(shown):
+            result["failures_not_shown"] = len(failures) - len(shown)
+    if cached:
+        result["cached_files"] = [item["path"] for item in cached]
+    return result
+
+
+# Function declaration (schema) for "run_tests"
+schema_run_tests = {
+    "name": "run_tests",
+    "description": (
+        "Runs the unittest and pytest-style tests in the working directory, or "
+        "selected ones, and returns pass/fail counts with the traceback of "
+        "each failure. Test files that passed before and whose code has not "
+        "changed since are not run again. Constrained to the working directory."
+    ),
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "tests": {
+                "type": "ARRAY",
+                "items": {"type": "STRING"},
+                "description": (
+                    "Optional tests to run: a test file ('tests.py'), a module, "
+                    "class or test name ('tests.TestCalculator.test_addition', "
+                    "'test_addition'), or 'file.py::Class::test'. Runs every "
+                    "discovered test when omitted."
+                ),
+            },
+            "force": {
+                "type": "BOOLEAN",
+                "description": (
+                    "Optional; run the selected tests even if their cached result is current."
+                ),
+            },
+        },
+    },
+}
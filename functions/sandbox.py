@@ -0,0 +1,195 @@
+import os
+import stat
+import threading
+from collections import OrderedDict
+
+# Opening relative to a directory descriptor isn't available everywhere
+# (notably Windows); there files are opened by their resolved path instead
+HAS_DIR_FD = os.open in os.supports_dir_fd and hasattr(os, "O_DIRECTORY")
+O_DIRECTORY = getattr(os, "O_DIRECTORY", 0)
+
+# Where the kernel reports what an open descriptor refers to
+FD_PATH_DIR = "/proc/self/fd"
+
+# Working directory roots kept open at once, for processes that serve many
+MAX_CACHED_ROOTS = 32
+
+
+class OutsideSandbox(ValueError):
+    pass
+
+
+class Root:
+    """
+    A working directory resolved once: its real path and, where the
+    platform allows, an open descriptor that files are opened under.
+    """
+
+    def __init__(self, working_directory):
+        self.path = os.path.realpath(working_directory)
+        self.fd = os.open(self.path, os.O_RDONLY | O_DIRECTORY) if HAS_DIR_FD else None
+        self.check_fds = self.fd is not None and os.path.isdir(FD_PATH_DIR)
+
+    def contains(self, full_path):
+        return full_path == self.path or full_path.startswith(self.path + os.sep)
+
+    def is_current(self, working_directory):
+        """
+        Whether working_directory is still the directory the descriptor
+        was opened on, rather than one moved or recreated since.
+        """
+        if self.fd is None:
+            return os.path.realpath(working_directory) == self.path
+        try:
+            now, then = os.stat(working_directory), os.fstat(self.fd)
+        except OSError:
+            return False
+        return (now.st_dev, now.st_ino) == (then.st_dev, then.st_ino)
+
+    def __del__(self):
+        # Closed once no caller still holds the root, not when it leaves
+        # the cache, so a descriptor is never closed while in use
+        if getattr(self, "fd", None) is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+# Least recently used first
+_roots = OrderedDict()
+_roots_lock = threading.Lock()
+
+
+def get_root(working_directory):
+    """
+    Returns the Root of a working directory, shared within the process
+    until the directory is replaced or MAX_CACHED_ROOTS newer ones are used.
+    """
+    key = os.path.abspath(working_directory)
+    with _roots_lock:
+        root = _roots.get(key)
+        if root is not None and root.is_current(key):
+            _roots.move_to_end(key)
+            return root
+        _roots.pop(key, None)
+        root = _roots[key] = Root(key)
+        while len(_roots) > MAX_CACHED_ROOTS:
+            _roots.popitem(last=False)
+        return root
+
+
+def resolve(working_directory, path="."):
+    """
+    Returns the real path of path, relative to the working directory, with
+    every symlink resolved.
+
+    Raises:
+        OutsideSandbox if the result is not inside the working directory
+        TypeError/ValueError/OSError for an invalid path
+    """
+    root = get_root(working_directory)
+    full_path = os.path.realpath(os.path.join(root.path, path))
+    if not root.contains(full_path):
+        raise OutsideSandbox(path)
+    return full_path
+
+
+def _relative(root, path):
+    """
+    Returns path relative to the root, after a lexical check that it
+    doesn't climb out with "..". Symlinks are checked after opening.
+    """
+    rel_path = os.path.normpath(path)
+    if os.path.isabs(rel_path):
+        rel_path = os.path.relpath(rel_path, root.path)
+    if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+        raise OutsideSandbox(path)
+    return rel_path
+
+
+def _open_beneath(root, path, flags, mode=0o666):
+    if not root.check_fds:
+        # No way to ask where a descriptor points: check the resolved path first
+        full_path = os.path.realpath(os.path.join(root.path, path))
+        if not root.contains(full_path):
+            raise OutsideSandbox(path)
+        return os.open(full_path, flags, mode)
+
+    fd = os.open(_relative(root, path), flags, mode, dir_fd=root.fd)
+    # The kernel's path for the open file has every symlink resolved, and
+    # unlike a check made before opening it can't be raced
+    try:
+        inside = root.contains(os.readlink(f"{FD_PATH_DIR}/{fd}"))
+    except BaseException:
+        os.close(fd)
+        raise
+    if not inside:
+        os.close(fd)
+        raise OutsideSandbox(path)
+    return fd
+
+
+def open_fd(working_directory, path, flags=os.O_RDONLY, mode=0o666):
+    """
+    Opens path, relative to the working directory, and returns a raw
+    descriptor. Symlinks are followed only as long as they stay inside.
+
+    Raises:
+        OutsideSandbox if path or a symlink on it leads outside
+        OSError as os.open does
+    """
+    return _open_beneath(get_root(working_directory), path, flags, mode)
+
+
+def open_file(working_directory, path, mode="rb", **kwargs):
+    """
+    Like open() for reading a regular file, with open_fd's checks.
+
+    Raises:
+        IsADirectoryError if path is not a regular file
+    """
+    file = os.fdopen(open_fd(working_directory, path), mode, **kwargs)
+    if not stat.S_ISREG(os.fstat(file.fileno()).st_mode):
+        file.close()
+        raise IsADirectoryError(f"{path} is not a regular file")
+    return file
+
+
+def open_dir(working_directory, path, create=False):
+    """
+    Opens the directory path, relative to the working directory, with
+    open_fd's checks and returns its descriptor for dir_fd arguments; the
+    caller closes it. Returns None where HAS_DIR_FD is false.
+
+    With create=True, missing directories are created one level at a time
+    under the already checked parent, so none can be created outside.
+    """
+    root = get_root(working_directory)
+    flags = os.O_RDONLY | O_DIRECTORY
+    if root.fd is None:
+        full_path = resolve(working_directory, path)
+        if create:
+            os.makedirs(full_path, exist_ok=True)
+        return None
+    try:
+        return _open_beneath(root, path, flags)
+    except FileNotFoundError:
+        if not create:
+            raise
+
+    fd = os.dup(root.fd)
+    try:
+        done = []
+        for name in _relative(root, path).split(os.sep):
+            try:
+                os.mkdir(name, dir_fd=fd)
+            except FileExistsError:
+                pass
+            done.append(name)
+            os.close(fd)
+            fd = -1
+            fd = _open_beneath(root, os.path.join(*done), flags)
+    except BaseException:
+        if fd >= 0:
+            os.close(fd)
+        raise
+    return fd
@@ -0,0 +1,475 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from functions import config, sandbox
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+SNIPPET_CHARS = 200
+
+# Bumped whenever what gets indexed changes, so older indexes are rebuilt
+INDEX_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS identifiers (
+    token TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    line INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS identifiers_token ON identifiers (token);
+CREATE INDEX IF NOT EXISTS identifiers_file ON identifiers (file_id);
+CREATE TABLE IF NOT EXISTS trigrams (
+    trigram INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    PRIMARY KEY (trigram, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS trigrams_file ON trigrams (file_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class CodeIndex:
+    """
+    On-disk inverted index of a working directory.
+
+    Identifiers are indexed with their line numbers and every file's
+    lowercased trigrams are indexed for substring queries. sync() walks the
+    tree and reindexes only files whose mtime or size changed; between syncs
+    (which persist across processes) queries are answered from the index
+    alone.
+    """
+
+    def __init__(self, root, db_path):
+        self.root = root
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        # The index can always be rebuilt, so trade durability for speed
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute("PRAGMA cache_size = -65536")
+        self._db.executescript(_SCHEMA)
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE key = 'version'"
+        ).fetchone()
+        if row is None or row[0] != str(INDEX_VERSION):
+            self._db.executescript(
+                "DELETE FROM identifiers; DELETE FROM trigrams; DELETE FROM files; "
+                "DELETE FROM meta;"
+            )
+            self._db.execute(
+                "INSERT INTO meta (key, value) VALUES ('version', ?)",
+                (str(INDEX_VERSION),),
+            )
+            self._db.commit()
+        # Lets pruning tell when the working directory is gone
+        self._db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('root', ?)", (root,)
+        )
+        self._db.commit()
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE key = 'last_sync'"
+        ).fetchone()
+        self.last_sync = float(row[0]) if row else 0.0
+
+    def sync(self):
+        """
+        Brings the index up to date with the tree, based on file mtimes.
+        """
+        with self._lock:
+            known = {
+                path: (file_id, mtime_ns, size)
+                for file_id, path, mtime_ns, size in self._db.execute(
+                    "SELECT id, path, mtime_ns, size FROM files"
+                )
+            }
+            seen = set()
+            for rel_path, stat in self._walk():
+                seen.add(rel_path)
+                entry = known.get(rel_path)
+                if entry and entry[1:] == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                self._index_file(rel_path, stat)
+            for rel_path in known.keys() - seen:
+                self._remove_file(rel_path)
+            self.last_sync = time.time()
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_sync', ?)",
+                (str(self.last_sync),),
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def update(self, rel_path):
+        """
+        Reindexes (or drops) a single file, e.g. right after it was written.
+        """
+        with self._lock:
+            try:
+                stat = os.stat(os.path.join(self.root, rel_path))
+            except OSError:
+                self._remove_file(rel_path)
+            else:
+                self._index_file(rel_path, stat)
+            self._db.commit()
+
+    def _walk(self):
+        stack = [self.root]
+        while stack:
+            dir_path = stack.pop()
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.startswith(".") or entry.name == "__pycache__":
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat()
+                        if stat.st_size <= config.MAX_INDEX_FILE_BYTES:
+                            yield os.path.relpath(entry.path, self.root), stat
+                except OSError:
+                    continue
+
+    def _remove_file(self, rel_path):
+        row = self._db.execute(
+            "SELECT id FROM files WHERE path = ?", (rel_path,)
+        ).fetchone()
+        if row:
+            self._db.execute("DELETE FROM identifiers WHERE file_id = ?", row)
+            self._db.execute("DELETE FROM trigrams WHERE file_id = ?", row)
+            self._db.execute("DELETE FROM files WHERE id = ?", row)
+
+    def _index_file(self, rel_path, stat):
+        self._remove_file(rel_path)
+        cursor = self._db.execute(
+            "INSERT INTO files (path, mtime_ns, size) VALUES (?, ?, ?)",
+            (rel_path, stat.st_mtime_ns, stat.st_size),
+        )
+        file_id = cursor.lastrowid
+
+        # Binary files are recorded without postings so they aren't reread
+        text = _read_text(os.path.join(self.root, rel_path))
+        if text is None:
+            return
+
+        identifiers = []
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            for token in set(IDENTIFIER_RE.findall(line)):
+                identifiers.append((token, file_id, line_number))
+        self._db.executemany(
+            "INSERT INTO identifiers (token, file_id, line) VALUES (?, ?, ?)",
+            identifiers,
+        )
+
+        self._db.executemany(
+            "INSERT INTO trigrams (trigram, file_id) VALUES (?, ?)",
+            ((trigram, file_id) for trigram in _trigrams(text)),
+        )
+
+    def find_identifier(self, token, prefix, limit):
+        with self._lock:
+            return self._db.execute(
+                "SELECT files.path, identifiers.line FROM identifiers "
+                "JOIN files ON files.id = identifiers.file_id "
+                "WHERE identifiers.token = ? "
+                "AND (files.path = ? OR files.path LIKE ? ESCAPE '\\') "
+                "ORDER BY files.path, identifiers.line LIMIT ?",
+                (token, prefix, _like_prefix(prefix), limit),
+            ).fetchall()
+
+    def candidate_files(self, query, prefix, page_size=200):
+        """
+        Yields the paths whose content contains every trigram of query.
+
+        Candidates are walked from the rarest trigram's postings and checked
+        against the others with primary-key lookups, a page at a time, so a
+        caller that stops early never pays for the full intersection.
+        """
+        trigrams = _trigrams(query)
+        with self._lock:
+            counts = sorted(
+                (
+                    self._db.execute(
+                        "SELECT COUNT(*) FROM trigrams WHERE trigram = ?", (trigram,)
+                    ).fetchone()[0],
+                    trigram,
+                )
+                for trigram in trigrams
+            )
+        if not counts or counts[0][0] == 0:
+            return
+        rarest = counts[0][1]
+        others = [trigram for _, trigram in counts[1:]]
+        placeholders = ", ".join("?" for _ in others) or "NULL"
+
+        last_id = -1
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT t.file_id, files.path FROM trigrams t "
+                    "JOIN files ON files.id = t.file_id "
+                    "WHERE t.trigram = ? AND t.file_id > ? "
+                    "AND (files.path = ? OR files.path LIKE ? ESCAPE '\\') "
+                    "AND (SELECT COUNT(*) FROM trigrams u WHERE u.file_id = t.file_id "
+                    f"AND u.trigram IN ({placeholders})) = ? "
+                    "ORDER BY t.file_id LIMIT ?",
+                    (
+                        rarest,
+                        last_id,
+                        prefix,
+                        _like_prefix(prefix),
+                        *others,
+                        len(others),
+                        page_size,
+                    ),
+                ).fetchall()
+            for file_id, path in rows:
+                yield path
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1][0]
+
+
+def _trigrams(text):
+    """
+    Returns the lowercased trigrams of text packed into 63-bit integers.
+    """
+    lowered = text.lower()
+    return {
+        (ord(lowered[i]) << 42) | (ord(lowered[i + 1]) << 21) | ord(lowered[i + 2])
+        for i in range(len(lowered) - 2)
+    }
+
+
+def _like_prefix(prefix):
+    if not prefix:
+        return "%"
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + os.sep + "%"
+
+
+def _read_text(path):
+    try:
+        with open(path, "rb") as file:
+            data = file.read(config.MAX_INDEX_FILE_BYTES + 1)
+    except OSError:
+        return None
+    if len(data) > config.MAX_INDEX_FILE_BYTES or b"\0" in data[:8192]:
+        return None
+    return data.decode("utf-8", errors="replace")
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(working_directory, create=True):
+    """
+    Returns the CodeIndex for a working directory, shared within the process.
+    """
+    root = sandbox.get_root(working_directory).path
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            digest = hashlib.sha256(root.encode("utf-8")).hexdigest()[:16]
+            db_path = os.path.join(config.INDEX_DIR, f"{digest}.sqlite3")
+            if not create and not os.path.exists(db_path):
+                return None
+            index = _indexes[root] = CodeIndex(root, db_path)
+            # Opening counts as use for pruning
+            os.utime(db_path)
+            for other_root, other in list(_indexes.items()):
+                if not os.path.isdir(other_root):
+                    # A temporary workspace since removed
+                    del _indexes[other_root]
+                    other.close()
+            _prune_indexes({i.db_path for i in _indexes.values()})
+        return index
+
+
+def _prune_indexes(open_paths):
+    """
+    Deletes index databases whose working directory is gone, and the least
+    recently opened ones beyond config.MAX_INDEXES. Indexes open in this
+    process are kept.
+    """
+    try:
+        with os.scandir(config.INDEX_DIR) as it:
+            entries = sorted(
+                (
+                    (entry.stat().st_mtime_ns, entry.path)
+                    for entry in it
+                    if entry.name.endswith(".sqlite3")
+                ),
+                reverse=True,
+            )
+    except OSError:
+        return
+    for number, (_, db_path) in enumerate(entries):
+        if db_path in open_paths:
+            continue
+        if number < config.MAX_INDEXES and _root_exists(db_path):
+            continue
+        for path in (db_path, db_path + "-wal", db_path + "-shm"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _root_exists(db_path):
+    try:
+        db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            row = db.execute("SELECT value FROM meta WHERE key = 'root'").fetchone()
+        finally:
+            db.close()
+    except sqlite3.Error:
+        # Unreadable right now, maybe busy: leave it for next time
+        return True
+    return row is None or os.path.isdir(row[0])
+
+
+def notify_file_written(working_directory, full_path):
+    """
+    Updates the index entry of a file written through the agent, if the
+    working directory has an index.
+    """
+    index = get_index(working_directory, create=False)
+    if index is not None:
+        index.update(os.path.relpath(os.path.realpath(full_path), index.root))
+
+
+def notify_tree_changed(working_directory):
+    """
+    Marks the index of a working directory as due for a sync, after
+    something other than write_file may have changed any file in it (a
+    script or test run).
+    """
+    index = get_index(working_directory, create=False)
+    if index is not None:
+        index.last_sync = 0.0
+
+
+def search_code(working_directory, query, directory=".", max_results=20):
+    """
+    Searches the working directory for an identifier or a text snippet
+    using the on-disk index, returning matching file/line snippets.
+    """
+    try:
+        full_path = sandbox.resolve(working_directory, directory)
+    except sandbox.OutsideSandbox:
+        return f'Error: Cannot search "{directory}" as it is outside the permitted working directory'
+    except (TypeError, ValueError, OSError) as e:
+        return f"Error: Invalid path arguments - {str(e)}"
+
+    if not isinstance(query, str) or not query.strip():
+        return "Error: Query must be a non-empty string"
+    try:
+        max_results = max(1, min(int(max_results), config.MAX_SEARCH_RESULTS))
+    except (TypeError, ValueError) as e:
+        return f"Error: Invalid max_results - {str(e)}"
+
+    try:
+        index = get_index(working_directory)
+        if time.time() - index.last_sync > config.INDEX_REFRESH_SECONDS:
+            index.sync()
+    except (sqlite3.Error, OSError) as e:
+        return f"Error: Cannot build search index - {str(e)}"
+
+    prefix = os.path.relpath(full_path, index.root)
+    prefix = "" if prefix == "." else prefix
+
+    matches = []
+    if IDENTIFIER_RE.fullmatch(query):
+        file_lines = {}
+        for rel_path, line_number in index.find_identifier(query, prefix, max_results):
+            if rel_path not in file_lines:
+                text = _read_text(os.path.join(index.root, rel_path)) or ""
+                file_lines[rel_path] = text.splitlines()
+            lines = file_lines[rel_path]
+            if line_number <= len(lines):
+                matches.append((rel_path, line_number, lines[line_number - 1]))
+
+    if not matches:
+        if len(query) < 3:
+            return f'No matches for "{query}" (text searches need at least 3 characters)'
+        needle = query.lower()
+        for rel_path in index.candidate_files(query, prefix):
+            text = _read_text(os.path.join(index.root, rel_path)) or ""
+            for line_number, line in enumerate(text.splitlines(), start=1):
+                if needle in line.lower():
+                    matches.append((rel_path, line_number, line))
+                    if len(matches) >= max_results:
+                        break
+            if len(matches) >= max_results:
+                break
+
+    if not matches:
+        return f'No matches for "{query}"'
+
+    lines = [
+        f"{rel_path}:{line_number}: {line.strip()[:SNIPPET_CHARS]}"
+        for rel_path, line_number, line in matches
+    ]
+    if len(matches) >= max_results:
+        lines.append(f"... (stopped after {max_results} matches)")
+    return "\n".join(lines)
+
+
+# Function declaration (schema) for "search_code"
+schema_search_code = {
+    "name": "search_code",
+    "description": (
+        "Searches files in the working directory for an identifier or a text "
+        "snippet using a persistent index, and returns matching lines as "
+        "path:line: snippet."
+    ),
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "query": {
+                "type": "STRING",
+                "description": (
+                    "An identifier (exact match) or a text snippet of at least "
+                    "3 characters (case-insensitive substring match)."
+                ),
+            },
+            "directory": {
+                "type": "STRING",
+                "description": (
+                    "Optional directory to restrict the search to, relative to the "
+                    "working directory. Defaults to the whole working directory."
+                ),
+            },
+            "max_results": {
+                "type": "INTEGER",
+                "description": (
+                    "Optional maximum number of matching lines to return, "
+                    f"capped at {config.MAX_SEARCH_RESULTS}."
+                ),
+            },
+        },
+        "required": ["query"],
+    },
+}
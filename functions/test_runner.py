@@ -0,0 +1,210 @@
+"""
+Child side of run_tests: runs as a script in a fresh (or warm pool)
+interpreter with the workspace as its working directory, and takes one
+JSON job as its argument:
+
+    {"modules": [{"path": "tests.py", "select": ["TestCalculator"]}, ...],
+     "result_path": "...", "max_traceback_chars": 4000}
+
+For each module it writes the id of every test it defines, a record per
+test run, and the workspace files imported by then, which run_tests
+hashes to decide what can be skipped next time. Only the standard library
+is used, so it runs the same under any project.
+"""
+
+import importlib
+import inspect
+import json
+import os
+import sys
+import time
+import traceback
+import unittest
+
+
+class RecordingResult(unittest.TestResult):
+    """
+    Keeps one record per test (or failing subtest) with its outcome,
+    duration and, for failures, the traceback with captured output.
+    """
+
+    def __init__(self, max_traceback_chars):
+        super().__init__()
+        self.buffer = True
+        self.max_traceback_chars = max_traceback_chars
+        self.records = []
+        self._started = 0.0
+
+    def startTest(self, test):
+        self._started = time.perf_counter()
+        super().startTest(test)
+
+    def _record(self, test, status, err=None, reason=None):
+        record = {
+            "test": test.id(),
+            "status": status,
+            "seconds": round(time.perf_counter() - self._started, 4),
+        }
+        if err is not None:
+            text = self._exc_info_to_string(err, test)
+            if len(text) > self.max_traceback_chars:
+                text = "...\n" + text[-self.max_traceback_chars :]
+            record["traceback"] = text
+        if reason:
+            record["reason"] = reason
+        self.records.append(record)
+
+    def addSuccess(self, test):
+        super().addSuccess(test)
+        self._record(test, "pass")
+
+    def addFailure(self, test, err):
+        super().addFailure(test, err)
+        self._record(test, "fail", err)
+
+    def addError(self, test, err):
+        super().addError(test, err)
+        self._record(test, "error", err)
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        self._record(test, "skip", reason=reason)
+
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err)
+        self._record(test, "pass", reason="expected failure")
+
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self._record(test, "fail", reason="unexpected success")
+
+    def addSubTest(self, test, subtest, err):
+        super().addSubTest(test, subtest, err)
+        if err is not None:
+            failed = issubclass(err[0], test.failureException)
+            self._record(subtest, "fail" if failed else "error", err)
+
+
+class FunctionTest(unittest.FunctionTestCase):
+    """
+    A pytest-style module-level test function, with a module-qualified id.
+    """
+
+    def id(self):
+        function = self._testFunc
+        return f"{function.__module__}.{function.__name__}"
+
+
+def module_name(path):
+    return os.path.splitext(path)[0].replace(os.sep, ".").replace("/", ".")
+
+
+def iter_tests(suite):
+    for item in suite:
+        if isinstance(item, unittest.TestSuite):
+            yield from iter_tests(item)
+        else:
+            yield item
+
+
+def collect(module):
+    """
+    Returns the TestCase classes' tests and the module's argument-free
+    test_* functions.
+    """
+    tests = list(iter_tests(unittest.defaultTestLoader.loadTestsFromModule(module)))
+    for name, value in vars(module).items():
+        if (
+            name.startswith("test")
+            and inspect.isfunction(value)
+            and value.__module__ == module.__name__
+            and not any(
+                p.default is p.empty
+                for p in inspect.signature(value).parameters.values()
+            )
+        ):
+            tests.append(FunctionTest(value))
+    return tests
+
+
+def selected(test_id, selectors):
+    if not selectors:
+        return True
+    dotted = f".{test_id}."
+    return any(
+        test_id == s or test_id.startswith(s + ".") or f".{s}." in dotted
+        for s in selectors
+    )
+
+
+def workspace_files(root):
+    """
+    Returns the workspace files of every imported module, relative to root.
+    """
+    files = set()
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if not path:
+            continue
+        path = os.path.realpath(path)
+        if path.startswith(root + os.sep) and path != os.path.realpath(__file__):
+            files.add(os.path.relpath(path, root))
+    return sorted(files)
+
+
+def import_traceback(root, error):
+    """
+    Formats an import error without the runner's and importlib's frames.
+    """
+    details = traceback.TracebackException.from_exception(error)
+    frames = [f for f in details.stack if f.filename.startswith(root + os.sep)]
+    # A SyntaxError names its file and line itself
+    if frames or isinstance(error, SyntaxError):
+        details.stack = traceback.StackSummary.from_list(frames)
+    return "".join(details.format())
+
+
+def run_module(root, job, max_traceback_chars):
+    name = module_name(job["path"])
+    report = {"path": job["path"], "module": name, "tests": [], "records": []}
+    started = time.perf_counter()
+    try:
+        module = importlib.import_module(name)
+        tests = collect(module)
+    except BaseException as e:
+        if isinstance(e, KeyboardInterrupt):
+            raise
+        text = import_traceback(root, e)[-max_traceback_chars:]
+        report["records"].append(
+            {"test": name, "status": "error", "seconds": 0.0, "traceback": text}
+        )
+        report["deps"] = workspace_files(root)
+        return report
+
+    report["tests"] = [test.id() for test in tests]
+    result = RecordingResult(max_traceback_chars)
+    unittest.TestSuite(
+        [test for test in tests if selected(test.id(), job.get("select"))]
+    ).run(result)
+    report["records"] = result.records
+    report["deps"] = workspace_files(root)
+    report["seconds"] = round(time.perf_counter() - started, 4)
+    return report
+
+
+def main():
+    job = json.loads(sys.argv[1])
+    root = os.path.realpath(os.getcwd())
+    sys.path[0] = root
+    max_traceback_chars = job.get("max_traceback_chars", 4000)
+
+    reports = []
+    for module_job in job["modules"]:
+        reports.append(run_module(root, module_job, max_traceback_chars))
+        # Written after every module so a crash or timeout keeps what ran
+        with open(job["result_path"], "w", encoding="utf-8") as file:
+            json.dump(reports, file)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 import os
-from google.genai import types
+import sqlite3
+from functions import sandbox
+from functions.atomic_write import atomic_write
+from functions.search_code import notify_file_written
 
 
 def write_file(working_directory, file_path, content):
@@ -8,30 +11,36 @@ def write_file(working_directory, file_path, content):
     Constrained to the working directory.
     """
     try:
-        abs_working_dir = os.path.abspath(working_directory)
-        full_path = os.path.abspath(os.path.join(working_directory, file_path))
-
-        if not (
-            full_path == abs_working_dir
-            or full_path.startswith(abs_working_dir + os.sep)
-        ):
-            return f'Error: Cannot write to "{file_path}" as it is outside the permitted working directory'
-
+        full_path = sandbox.resolve(working_directory, file_path)
+    except sandbox.OutsideSandbox:
+        return f'Error: Cannot write to "{file_path}" as it is outside the permitted working directory'
     except (TypeError, ValueError, OSError) as e:
         return f"Error: Invalid path arguments - {str(e)}"
 
     try:
         # Create directory if it doesn't exist
-        dir_path = os.path.dirname(full_path)
-        if dir_path and not os.path.exists(dir_path):
-            os.makedirs(dir_path, exist_ok=True)
+        dir_fd = sandbox.open_dir(
+            working_directory, os.path.dirname(full_path), create=True
+        )
 
-        # Write the file
-        with open(full_path, 'w', encoding='utf-8') as file:
-            file.write(content)
+        # Write the file through a temp file so a crash can't truncate it
+        try:
+            atomic_write(full_path, content, dir_fd=dir_fd)
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+
+        # Keep the search index in step with the file we just wrote
+        try:
+            notify_file_written(working_directory, full_path)
+        except sqlite3.Error:
+            pass
         
         return f"Successfully wrote {len(content)} characters to {file_path}"
 
+    except sandbox.OutsideSandbox:
+        # Only the working directory itself gets here; its parent is outside
+        return f'Error: Cannot write to "{file_path}" as it is outside the permitted working directory'
     except PermissionError:
         return f"Error: Permission denied writing to {file_path}"
     except OSError as e:
@@ -39,28 +48,28 @@ def write_file(working_directory, file_path, content):
 
 
 # Function declaration (schema) for "write_file"
-schema_write_file = types.FunctionDeclaration(
-    name="write_file",
-    description=(
+schema_write_file = {
+    "name": "write_file",
+    "description": (
         "Writes content to a file, creating it if it doesn't exist or overwriting if it does. "
         "Constrained to the working directory."
     ),
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description=(
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "file_path": {
+                "type": "STRING",
+                "description": (
                     "The path to the file to write to, relative to the working directory."
                 ),
-            ),
-            "content": types.Schema(
-                type=types.Type.STRING,
-                description=(
+            },
+            "content": {
+                "type": "STRING",
+                "description": (
                     "The content to write to the file."
                 ),
-            ),
+            },
         },
-        required=["file_path", "content"],
-    ),
-)
\ No newline at end of file
+        "required": ["file_path", "content"],
+    },
+}
\ No newline at end of file
@@ -1,16 +1,35 @@
+import argparse
+import asyncio
 import os
+import signal
 import sys
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-from functions.get_files_info import schema_get_files_info, get_files_info
-from functions.get_file_content import schema_get_file_content, get_file_content
-from functions.run_python_file import schema_run_python_file, run_python_file
-from functions.write_file import schema_write_file, write_file
-
-load_dotenv()
-api_key = os.environ.get("GEMINI_API_KEY")
-client = genai.Client(api_key=api_key)
+from functools import cache
+from functions import config, python_pool, registry
+from agent.batch import DEFAULT_CONCURRENCY, run_batch
+from agent.checkpoint import DEFAULT_SESSION_DIR, SessionCheckpoint
+from agent.daemon import DEFAULT_SOCKET, AgentDaemon
+from agent.dispatcher import DEFAULT_MAX_WORKERS, ToolDispatcher
+from agent.history import DEFAULT_TOKEN_BUDGET, ConversationHistory
+from agent.ratelimit import RateLimiter
+from agent.response_cache import DEFAULT_CACHE_DIR, CachedModels, ResponseCache
+from agent.retry import (
+    DEFAULT_CALL_TIMEOUT,
+    DEFAULT_MAX_RETRIES,
+    RetryingModels,
+    RetryPolicy,
+    RetryStats,
+)
+from agent.tool_cache import ToolResultCache
+from agent.tracing import TracedModels, Tracer
+
+# The SDK and the client are only loaded once a model request is made,
+# so the usage message and tool-only imports start quickly
+client = None
+
+MODEL_NAME = "gemini-2.0-flash-001"
+MAX_ITERATIONS = 20
+# Paths the daemon's shared tool result cache holds before evicting the oldest
+TOOL_CACHE_MAX_PATHS = 10000
 
 system_prompt = """
 You are a helpful AI coding agent.
@@ -18,55 +37,92 @@ You are a helpful AI coding agent.
 When a user asks a question or makes a request, make a function call plan. You can perform the following operations:
 
 - List files and directories
-- Read file contents
+- Read file contents, or several files at once
 - Execute Python files with optional arguments
+- Run the tests, or selected tests, and get pass/fail results with tracebacks
 - Write or overwrite files
+- Edit part of a file with search/replace edits or a unified diff
+- Search the code for an identifier or a text snippet
 
 All paths you provide should be relative to the working directory. You do not need to specify the working directory in your function calls as it is automatically injected for security reasons.
 """
 
-available_functions = types.Tool(
-    function_declarations=[
-        schema_get_files_info,
-        schema_get_file_content,
-        schema_run_python_file,
-        schema_write_file,
-    ]
-)
-
 # Dictionary mapping function names to their implementations
-function_map = {
-    "get_files_info": get_files_info,
-    "get_file_content": get_file_content,
-    "run_python_file": run_python_file,
-    "write_file": write_file,
-}
+function_map = registry.load_tools()
+
+
+def get_client():
+    """
+    Returns the genai.Client, creating it on first use.
+    """
+    global client
+    if client is None:
+        from dotenv import load_dotenv
+        from google import genai
+
+        load_dotenv()
+        http_options = None
+        if os.environ.get("GEMINI_BASE_URL"):
+            # e.g. a local fake server (benchmarks/fake_server.py)
+            http_options = {"base_url": os.environ["GEMINI_BASE_URL"]}
+        client = genai.Client(
+            api_key=os.environ.get("GEMINI_API_KEY"), http_options=http_options
+        )
+    return client
 
 
-def call_function(function_call_part, verbose=False):
+@cache
+def generate_config():
+    """
+    Returns the GenerateContentConfig sent with every model request.
+    """
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        tools=[registry.tool_declarations()], system_instruction=system_prompt
+    )
+
+
+def __getattr__(name):
+    # Tool declarations are built on first access
+    if name == "available_functions":
+        return registry.tool_declarations()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def call_function(
+    function_call_part, verbose=False, tools=None, echo=True, working_directory=None
+):
     """
     Handle the abstract task of calling one of our four functions.
     
     Args:
         function_call_part: A types.FunctionCall with .name and .args properties
         verbose: If True, print detailed information about the function call
+        tools: Mapping of function names to implementations, defaults to function_map
+        echo: If False, don't print the function name when not verbose
+        working_directory: Workspace the tool runs in, defaults to
+            config.WORKING_DIRECTORY
     
     Returns:
         types.Content with the function result or error
     """
+    from google.genai import types
+
+    tools = tools or function_map
     function_name = function_call_part.name
     function_args = dict(function_call_part.args or {})
     
     # Add working_directory to the arguments
-    function_args["working_directory"] = "./calculator"
+    function_args["working_directory"] = working_directory or config.WORKING_DIRECTORY
     
     if verbose:
         print(f"Calling function: {function_name}({function_args})")
-    else:
+    elif echo:
         print(f" - Calling function: {function_name}")
     
     # Check if function exists
-    if function_name not in function_map:
+    if function_name not in tools:
         return types.Content(
             role="tool",
             parts=[
@@ -79,7 +135,7 @@ def call_function(function_call_part, verbose=False):
     
     # Call the function
     try:
-        function_result = function_map[function_name](**function_args)
+        function_result = tools[function_name](**function_args)
         return types.Content(
             role="tool",
             parts=[
@@ -101,93 +157,563 @@ def call_function(function_call_part, verbose=False):
         )
 
 
+def collect_function_responses(results, verbose=False):
+    """
+    Validates call_function results and flattens them into response parts.
+
+    Args:
+        results: types.Content results from call_function, in call order
+        verbose: If True, print each function response
+
+    Returns:
+        List of types.Part to send back to the model as one user message
+    """
+    function_responses = []
+    for function_call_result in results:
+        # Validate the response structure
+        if not (function_call_result.parts and 
+               len(function_call_result.parts) > 0 and 
+               hasattr(function_call_result.parts[0], 'function_response') and
+               function_call_result.parts[0].function_response and
+               hasattr(function_call_result.parts[0].function_response, 'response')):
+            raise RuntimeError("Invalid function call result structure")
+        
+        # Print result if verbose
+        if verbose:
+            print(f"-> {function_call_result.parts[0].function_response.response}")
+        
+        # Collect function responses
+        function_responses.extend(function_call_result.parts)
+    return function_responses
+
+
+def _merge_stream_parts(parts, chunk_parts):
+    from google.genai import types
+
+    # Streamed text arrives in many small parts; keep one text part per run
+    for part in chunk_parts:
+        if part.text is not None and not part.thought and parts and (
+            parts[-1].text is not None and not parts[-1].thought
+        ):
+            parts[-1] = types.Part(text=parts[-1].text + part.text)
+        else:
+            parts.append(part)
+
+
+async def run_conversation_async(
+    history,
+    dispatcher,
+    verbose=False,
+    models=None,
+    echo=True,
+    tracer=None,
+    start_iteration=0,
+    on_iteration=None,
+):
+    """
+    Streaming conversation loop built on the async client.
+
+    Text is printed as it arrives and each function call is handed to the
+    dispatcher as soon as its part has been received, so tools run while the
+    rest of the response is still streaming.
+
+    Args:
+        history: ConversationHistory of the session
+        dispatcher: ToolDispatcher that runs the function calls
+        verbose: If True, print function results and prompt sizes
+        models: Async models object to use, defaults to client.aio.models
+        echo: If False, don't print the response text as it arrives
+        tracer: Tracer recording a span per iteration
+        start_iteration: Iterations already used, when resuming a session
+        on_iteration: Optional callback(iterations_used) as each iteration starts
+
+    Returns:
+        The final text response, or None if the session ended without one
+
+    Raises:
+        Whatever the model request or the response handling raised
+    """
+    from google.genai import types
+
+    models = models or get_client().aio.models
+    tracer = tracer or Tracer()
+    for iteration in range(start_iteration, MAX_ITERATIONS):
+        if on_iteration:
+            on_iteration(iteration + 1)
+        with tracer.span("iteration", "agent", number=iteration + 1):
+            stream = await models.generate_content_stream(
+                model=MODEL_NAME,
+                contents=history.prompt(),
+                config=generate_config(),
+            )
+
+            parts = []
+            pending_calls = []
+            text = ""
+            usage_metadata = None
+            async for chunk in stream:
+                usage_metadata = chunk.usage_metadata or usage_metadata
+                if not chunk.candidates or not chunk.candidates[0].content:
+                    continue
+                chunk_parts = chunk.candidates[0].content.parts or []
+                for part in chunk_parts:
+                    if part.function_call:
+                        future = dispatcher.submit(part.function_call)
+                        pending_calls.append(asyncio.wrap_future(future))
+                    elif part.text and not part.thought:
+                        if echo:
+                            print(part.text, end="", flush=True)
+                        text += part.text
+                _merge_stream_parts(parts, chunk_parts)
+
+            if echo and text and not text.endswith("\n"):
+                print()
+            if verbose:
+                print(history.report(usage_metadata))
+            if parts:
+                history.append(types.Content(role="model", parts=parts))
+
+            if pending_calls:
+                results = await asyncio.gather(*pending_calls)
+                function_responses = collect_function_responses(results, verbose)
+                history.append(types.Content(role="user", parts=function_responses))
+                continue
+
+            if text:
+                return text.strip()
+
+    if echo:
+        print(f"Reached maximum iterations ({MAX_ITERATIONS}). Stopping.")
+    return None
+
+
+USAGE = (
+    "Usage: python main.py <prompt> [--verbose] [--max-parallel N] [--stream] "
+    "[--token-budget N] [--cache | --replay] [--cache-dir DIR] [--warm-pool N] "
+    "[--run-timeout S] [--output-limit BYTES] [--cpu-limit S] [--memory-limit MB] "
+    "[--trace FILE] [--chrome-trace FILE] [--trace-summary] [--rpm N] "
+    "[--max-retries N] [--call-timeout S] [--session-deadline S]\n"
+    "       python main.py --resume SESSION [--session-dir DIR] [options]\n"
+    "       python main.py --batch PROMPTS.jsonl [--output RESULTS.jsonl] "
+    "[--concurrency N] [--resume] [options]\n"
+    "       python main.py --serve [SOCKET] [--concurrency N] [options]\n"
+    "Options include --workspace DIR, the directory the tools work in "
+    "(default ./calculator)."
+)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("prompt", nargs="*")
+    parser.add_argument("--workspace", metavar="DIR")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument(
+        "--max-parallel", type=int, default=DEFAULT_MAX_WORKERS, metavar="N"
+    )
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument(
+        "--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET, metavar="N"
+    )
+    parser.add_argument("--cache", action="store_true")
+    parser.add_argument("--replay", action="store_true")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, metavar="DIR")
+    parser.add_argument("--warm-pool", type=int, default=0, metavar="N")
+    parser.add_argument(
+        "--run-timeout", type=int, default=config.RUN_TIMEOUT_SECONDS, metavar="S"
+    )
+    parser.add_argument(
+        "--output-limit",
+        type=int,
+        default=config.RUN_OUTPUT_HEAD_BYTES + config.RUN_OUTPUT_TAIL_BYTES,
+        metavar="BYTES",
+    )
+    parser.add_argument("--cpu-limit", type=int, metavar="S")
+    parser.add_argument("--memory-limit", type=int, metavar="MB")
+    parser.add_argument("--batch", metavar="FILE")
+    parser.add_argument("--serve", nargs="?", const=DEFAULT_SOCKET, metavar="SOCKET")
+    parser.add_argument("--output", metavar="FILE")
+    parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY, metavar="N"
+    )
+    parser.add_argument("--rpm", type=int, default=0, metavar="N")
+    # --resume SESSION continues a checkpointed session; bare --resume
+    # continues an interrupted --batch
+    parser.add_argument("--resume", nargs="?", const=True, metavar="SESSION")
+    parser.add_argument("--session-dir", default=DEFAULT_SESSION_DIR, metavar="DIR")
+    parser.add_argument("--trace", metavar="FILE")
+    parser.add_argument("--chrome-trace", metavar="FILE")
+    parser.add_argument("--trace-summary", action="store_true")
+    parser.add_argument(
+        "--max-retries", type=int, default=DEFAULT_MAX_RETRIES, metavar="N"
+    )
+    parser.add_argument(
+        "--call-timeout", type=float, default=DEFAULT_CALL_TIMEOUT, metavar="S"
+    )
+    parser.add_argument("--session-deadline", type=float, metavar="S")
+    return parser.parse_intermixed_args(argv)
+
+
+def session_models(models, args, tracer, cache=None, limiter=None, retry_stats=None):
+    """
+    Wraps a models object for one session. Retries and the rate limiter
+    sit closest to the service so cache hits skip both, and tracing is
+    outermost so a model span covers every attempt.
+    """
+    policy = RetryPolicy(max_retries=args.max_retries, call_timeout=args.call_timeout)
+    models = RetryingModels(
+        models,
+        policy,
+        limiter=limiter,
+        stats=retry_stats,
+        session_deadline=args.session_deadline,
+    )
+    if cache:
+        models = CachedModels(models, cache)
+    return TracedModels(models, tracer)
+
+
+def report_run(args, tracer, tool_cache=None, cache=None, retry_stats=None):
+    """
+    Prints the end-of-run summaries and writes the trace files requested
+    on the command line, if there is a tracer.
+    """
+    if retry_stats and (args.verbose or retry_stats.retries or retry_stats.failures):
+        print(retry_stats.summary())
+    if args.verbose and tool_cache:
+        print(tool_cache.summary())
+    if args.verbose and cache:
+        print(f"Response cache: {cache.hits} hits, {cache.misses} misses")
+    if tracer is None:
+        return
+    if args.trace_summary or args.verbose:
+        print(tracer.summary())
+    try:
+        if args.trace:
+            tracer.write_jsonl(args.trace)
+        if args.chrome_trace:
+            tracer.write_chrome_trace(args.chrome_trace)
+    except OSError as e:
+        print(f"Error: Cannot write trace - {e}")
+
+
+def make_session_runner(
+    args, tracer=None, cache=None, limiter=None, retry_stats=None, tool_cache=None
+):
+    """
+    Returns run_session(session_id, prompt, workspace=None), an async
+    function running one quiet streaming session over the shared async
+    client and returning its final text.
+
+    Without a tracer or tool_cache, each session gets its own, so a
+    long-lived process doesn't accumulate spans.
+    """
+    from google.genai import types
+
+    verbose = args.verbose
+
+    async def run_session(session_id, prompt, workspace=None):
+        session_tracer = tracer or Tracer()
+        # Each session gets its own deadline
+        models = session_models(
+            get_client().aio.models, args, session_tracer, cache, limiter, retry_stats
+        )
+        history = ConversationHistory(
+            [types.Content(role="user", parts=[types.Part(text=prompt)])],
+            token_budget=args.token_budget,
+        )
+        tools = session_tracer.wrap_tools(
+            (tool_cache or ToolResultCache(verbose=verbose)).wrap(function_map)
+        )
+        with session_tracer.span(
+            "session", "agent", track=f"session {session_id}"
+        ), ToolDispatcher(
+            lambda fc: call_function(
+                fc, verbose=verbose, tools=tools, echo=False, working_directory=workspace
+            ),
+            max_workers=args.max_parallel,
+        ) as dispatcher:
+            return await run_conversation_async(
+                history,
+                dispatcher,
+                verbose,
+                models=models,
+                echo=False,
+                tracer=session_tracer,
+            )
+
+    return run_session
+
+
+def main_batch(args):
+    """
+    Runs every prompt of args.batch as its own session over one shared
+    async client, writing a JSON record per prompt to args.output.
+    """
+    output_path = args.output or os.path.splitext(args.batch)[0] + ".results.jsonl"
+
+    # The limiter and retry counters are shared by all sessions; cache
+    # hits don't count against the limit
+    limiter = RateLimiter(args.rpm) if args.rpm > 0 else None
+    retry_stats = RetryStats()
+    cache = None
+    if args.cache or args.replay:
+        cache = ResponseCache(args.cache_dir, replay=args.replay)
+    tracer = Tracer()
+    run_session = make_session_runner(args, tracer, cache, limiter, retry_stats)
+
+    try:
+        counts = asyncio.run(
+            run_batch(
+                run_session,
+                args.batch,
+                output_path,
+                concurrency=args.concurrency,
+                resume=args.resume,
+            )
+        )
+    except (OSError, ValueError) as e:
+        print(f"Error: Cannot run batch - {e}")
+        sys.exit(1)
+
+    print(
+        f"Batch finished in {counts['seconds']}s: {counts['ok']} ok, "
+        f"{counts['error']} failed, {counts['skipped']} already done "
+        f"-> {output_path}"
+    )
+    report_run(args, tracer, cache=cache, retry_stats=retry_stats)
+
+
+def main_serve(args):
+    """
+    Runs the agent as a daemon on the unix socket args.serve. The model
+    client, response cache, tool result cache, rate limiter and retry
+    counters are created once and shared by every session it serves.
+    """
+    limiter = RateLimiter(args.rpm) if args.rpm > 0 else None
+    retry_stats = RetryStats()
+    cache = None
+    if args.cache or args.replay:
+        cache = ResponseCache(args.cache_dir, replay=args.replay)
+    tool_cache = ToolResultCache(verbose=args.verbose, max_paths=TOOL_CACHE_MAX_PATHS)
+    run_session = make_session_runner(
+        args, cache=cache, limiter=limiter, retry_stats=retry_stats, tool_cache=tool_cache
+    )
+
+    # Pay for the SDK import, client and tool declarations before the first request
+    get_client()
+    generate_config()
+
+    def status():
+        status = {"tool_cache": tool_cache.summary(), "retries": retry_stats.summary()}
+        if cache:
+            status["response_cache"] = f"{cache.hits} hits, {cache.misses} misses"
+        return status
+
+    daemon = AgentDaemon(
+        run_session,
+        args.serve,
+        concurrency=args.concurrency,
+        default_workspace=config.WORKING_DIRECTORY,
+        status=status,
+    )
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, daemon.stop)
+        await daemon.serve()
+
+    print(f"Serving on {args.serve} (workspace {config.WORKING_DIRECTORY}); stop with Ctrl-C")
+    try:
+        asyncio.run(serve())
+    except OSError as e:
+        print(f"Error: Cannot serve - {e}")
+        sys.exit(1)
+    print(
+        f"Daemon stopped: {daemon.completed} sessions completed, {daemon.failed} failed"
+    )
+    # Sessions are traced separately and not kept, so there is no trace to write
+    report_run(args, None, tool_cache, cache, retry_stats)
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python main.py <prompt> [--verbose]")
+    args = parse_args(sys.argv[1:])
+    resume_session = args.resume if isinstance(args.resume, str) else None
+    if (
+        not (args.prompt or args.batch or resume_session or args.serve)
+        or (resume_session and (args.prompt or args.batch))
+        or (args.serve and (args.prompt or args.batch or args.resume))
+        or args.max_parallel < 1
+        or args.concurrency < 1
+    ):
+        print(USAGE)
         sys.exit(1)
 
-    # Parse command line arguments
-    verbose = "--verbose" in sys.argv
-    # Filter out --verbose from arguments to get the prompt
-    prompt_args = [arg for arg in sys.argv[1:] if arg != "--verbose"]
-    
-    if not prompt_args:
-        print("Usage: python main.py <prompt> [--verbose]")
+    verbose = args.verbose
+    user_prompt = " ".join(args.prompt)
+
+    # run_python_file settings
+    config.RUN_TIMEOUT_SECONDS = args.run_timeout
+    config.RUN_OUTPUT_HEAD_BYTES = args.output_limit // 2
+    config.RUN_OUTPUT_TAIL_BYTES = args.output_limit - args.output_limit // 2
+    config.RUN_CPU_LIMIT_SECONDS = args.cpu_limit
+    if args.memory_limit:
+        config.RUN_MEMORY_LIMIT_BYTES = args.memory_limit * 1024 * 1024
+    config.RUN_STREAM_OUTPUT = verbose
+    if args.warm_pool > 0:
+        python_pool.enable(args.warm_pool)
+
+    if args.workspace:
+        if not os.path.isdir(args.workspace):
+            print(f"Error: Workspace {args.workspace} is not a directory")
+            sys.exit(1)
+        config.WORKING_DIRECTORY = args.workspace
+
+    if args.batch:
+        main_batch(args)
+        return
+    if args.serve:
+        main_serve(args)
+        return
+
+    from google.genai import types
+
+    # Every message and tool result is appended to a checkpoint as it happens
+    try:
+        if resume_session:
+            checkpoint = SessionCheckpoint.load(resume_session, args.session_dir)
+        else:
+            checkpoint = SessionCheckpoint.create(
+                user_prompt, args.session_dir, workspace=config.WORKING_DIRECTORY
+            )
+    except (OSError, ValueError) as e:
+        print(f"Error: Cannot open session checkpoint - {e}")
         sys.exit(1)
-    
-    user_prompt = " ".join(prompt_args)
+    # A resumed session keeps working where it started unless told otherwise
+    if resume_session and checkpoint.workspace and not args.workspace:
+        config.WORKING_DIRECTORY = checkpoint.workspace
+    if verbose:
+        print(f"Session: {checkpoint.session_id} (workspace {config.WORKING_DIRECTORY})")
+
+    messages = checkpoint.messages
+    last = messages[-1]
+    if resume_session and last.role == "model" and not checkpoint.pending_calls():
+        print("Session already finished. Final response:")
+        print("".join(part.text or "" for part in last.parts or []).strip())
+        return
+    history = ConversationHistory(
+        messages, token_budget=args.token_budget, on_append=checkpoint.append_message
+    )
+
+    # Serve model responses from disk; --replay never reaches the service
+    models = get_client().aio.models if args.stream else get_client().models
+    cache = None
+    if args.cache or args.replay:
+        cache = ResponseCache(args.cache_dir, replay=args.replay)
+    tracer = Tracer()
+    # Transient errors are retried instead of ending the session
+    retry_stats = RetryStats()
+    limiter = RateLimiter(args.rpm) if args.rpm > 0 else None
+    models = session_models(models, args, tracer, cache, limiter, retry_stats)
+
+    # Repeated reads of unchanged paths are served from memory
+    tool_cache = ToolResultCache(verbose=verbose)
+    tools = tracer.wrap_tools(tool_cache.wrap(function_map))
 
-    messages = [
-        types.Content(
-            role="user",
-            parts=[types.Part(text=user_prompt)],
+    dispatcher = ToolDispatcher(
+        checkpoint.wrap_call(
+            lambda fc: call_function(fc, verbose=verbose, tools=tools), verbose=verbose
+        ),
+        max_workers=args.max_parallel,
+    )
+
+    # A run that died while tools were running finishes that turn first;
+    # calls whose results were recorded are not run again
+    pending_calls = checkpoint.pending_calls()
+    if pending_calls:
+        results = dispatcher.dispatch(pending_calls)
+        history.append(
+            types.Content(
+                role="user", parts=collect_function_responses(results, verbose)
+            )
         )
-    ]
+    start_iteration = checkpoint.iterations
+
+    if args.stream:
+        with dispatcher:
+            try:
+                asyncio.run(
+                    run_conversation_async(
+                        history,
+                        dispatcher,
+                        verbose,
+                        models=models,
+                        tracer=tracer,
+                        start_iteration=start_iteration,
+                        on_iteration=checkpoint.mark_iteration,
+                    )
+                )
+            except Exception as e:
+                print(f"Error during conversation: {e}")
+                print(f"Resume with: python main.py --resume {checkpoint.session_id}")
+        checkpoint.close()
+        report_run(args, tracer, tool_cache, cache, retry_stats)
+        return
 
     # Conversation loop with max 20 iterations
-    max_iterations = 20
-    for iteration in range(max_iterations):
-        try:
-            response = client.models.generate_content(
-                model="gemini-2.0-flash-001",
-                contents=messages,
-                config=types.GenerateContentConfig(
-                    tools=[available_functions], system_instruction=system_prompt
-                ),
-            )
+    max_iterations = MAX_ITERATIONS
+    for iteration in range(start_iteration, max_iterations):
+        checkpoint.mark_iteration(iteration + 1)
+        with tracer.span("iteration", "agent", number=iteration + 1):
+            try:
+                response = models.generate_content(
+                    model=MODEL_NAME,
+                    contents=history.prompt(),
+                    config=generate_config(),
+                )
+                if verbose:
+                    print(history.report(response.usage_metadata))
 
-            # Add each candidate's content to messages
-            if hasattr(response, 'candidates') and response.candidates:
-                for candidate in response.candidates:
-                    if hasattr(candidate, 'content') and candidate.content:
-                        messages.append(candidate.content)
+                # Add each candidate's content to messages
+                if hasattr(response, 'candidates') and response.candidates:
+                    for candidate in response.candidates:
+                        if hasattr(candidate, 'content') and candidate.content:
+                            history.append(candidate.content)
 
-            # Check if we have function calls to execute
-            if getattr(response, "function_calls", None):
-                function_responses = []
+                # Check if we have function calls to execute
+                if getattr(response, "function_calls", None):
+                    # Independent calls run concurrently; results come back in call order
+                    results = dispatcher.dispatch(response.function_calls)
+                    function_responses = collect_function_responses(results, verbose)
                 
-                for fc in response.function_calls:
-                    # Use call_function to handle the function call
-                    function_call_result = call_function(fc, verbose=verbose)
-                    
-                    # Validate the response structure
-                    if not (function_call_result.parts and 
-                           len(function_call_result.parts) > 0 and 
-                           hasattr(function_call_result.parts[0], 'function_response') and
-                           function_call_result.parts[0].function_response and
-                           hasattr(function_call_result.parts[0].function_response, 'response')):
-                        raise RuntimeError("Invalid function call result structure")
-                    
-                    # Print result if verbose
-                    if verbose:
-                        print(f"-> {function_call_result.parts[0].function_response.response}")
-                    
-                    # Collect function responses
-                    function_responses.extend(function_call_result.parts)
+                    # Add function responses as user message
+                    if function_responses:
+                        history.append(types.Content(
+                            role="user",
+                            parts=function_responses
+                        ))
                 
-                # Add function responses as user message
-                if function_responses:
-                    messages.append(types.Content(
-                        role="user",
-                        parts=function_responses
-                    ))
-                
-                # Continue the loop to let the LLM process the function results
-                continue
+                    # Continue the loop to let the LLM process the function results
+                    continue
             
-            # Check if we have a final text response
-            if hasattr(response, 'text') and response.text:
-                print("Final response:")
-                print(response.text.strip())
-                break
+                # Check if we have a final text response
+                if hasattr(response, 'text') and response.text:
+                    print("Final response:")
+                    print(response.text.strip())
+                    break
                 
-        except Exception as e:
-            print(f"Error during conversation: {e}")
-            break
+            except Exception as e:
+                print(f"Error during conversation: {e}")
+                print(f"Resume with: python main.py --resume {checkpoint.session_id}")
+                break
     
     else:
         print(f"Reached maximum iterations ({max_iterations}). Stopping.")
 
+    dispatcher.shutdown()
+    checkpoint.close()
+    report_run(args, tracer, tool_cache, cache, retry_stats)
+
 
 if __name__ == "__main__":
     main()
@@ -32,3 +32,226 @@ print('run_python_file("calculator", "nonexistent.py"):')
 result = run_python_file("calculator", "nonexistent.py")
 print(result)
 print("\n" + "=" * 50 + "\n")
+
+from functions.get_file_content import get_file_content
+
+# Test 6: Read a page of a file starting at a byte offset
+print('get_file_content("calculator", "lorem.txt", offset=5, limit=10):')
+result = get_file_content("calculator", "lorem.txt", offset=5, limit=10)
+print(result)
+print("\n" + "=" * 50 + "\n")
+
+from functions.get_files_info import get_files_info
+
+# Test 7: Recursive listing filtered to Python files
+print('get_files_info("calculator", ".", max_depth=2, include=["*.py"]):')
+result = get_files_info("calculator", ".", max_depth=2, include=["*.py"])
+print(result)
+print("\n" + "=" * 50 + "\n")
+
+from functions.search_code import search_code
+
+# Test 8: Search the indexed working directory for an identifier
+print('search_code("calculator", "Calculator"):')
+result = search_code("calculator", "Calculator")
+print(result)
+print("\n" + "=" * 50 + "\n")
+
+from functions.edit_file import edit_file
+
+# Test 9: Edit whose search text is not in the file (should error, file unchanged)
+print('edit_file("calculator", "lorem.txt", edits=[{"search": "not there", "replace": "x"}]):')
+result = edit_file("calculator", "lorem.txt", edits=[{"search": "not there", "replace": "x"}])
+print(result)
+print("\n" + "=" * 50 + "\n")
+
+from functions.read_files import read_files
+
+# Test 10: Read every Python file in the package in one call
+print('read_files("calculator", pattern="pkg/*.py"):')
+result = read_files("calculator", pattern="pkg/*.py")
+print(result)
+print("\n" + "=" * 50 + "\n")
+
+import os
+import tempfile
+
+# Test 11: Read through a symlink that points outside the working directory (should error)
+with tempfile.TemporaryDirectory() as workspace:
+    os.symlink(os.path.abspath("main.py"), os.path.join(workspace, "link.py"))
+    print('get_file_content(<workspace>, "link.py") with link.py -> the repo main.py:')
+    result = get_file_content(workspace, "link.py")
+    print(result)
+print("\n" + "=" * 50 + "\n")
+
+from functions.run_tests import run_tests
+
+# Test 12: Run the calculator tests twice; the second run comes from the cache
+print('run_tests("calculator", force=True):')
+result = run_tests("calculator", force=True)
+print(result)
+print('run_tests("calculator"):')
+result = run_tests("calculator")
+print(result)
+print("\n" + "=" * 50 + "\n")
+
+import time
+from functions import config
+
+# Test 13: Script that leaves a child holding its output pipes (should time out)
+with tempfile.TemporaryDirectory() as workspace:
+    with open(os.path.join(workspace, "spawn.py"), "w") as file:
+        file.write('import subprocess\nsubprocess.Popen(["sleep", "20"])\nprint("started")\n')
+    timeout, config.RUN_TIMEOUT_SECONDS = config.RUN_TIMEOUT_SECONDS, 2
+    try:
+        print('run_python_file(<workspace>, "spawn.py") with RUN_TIMEOUT_SECONDS=2:')
+        start = time.monotonic()
+        result = run_python_file(workspace, "spawn.py")
+        print(result)
+        print(f"returned after {time.monotonic() - start:.1f}s")
+    finally:
+        config.RUN_TIMEOUT_SECONDS = timeout
+print("\n" + "=" * 50 + "\n")
+
+from agent.tool_cache import ToolResultCache
+from functions.get_files_info import get_files_info
+from functions.write_file import write_file
+
+# Test 14: A write two directories down shows up in a cached recursive listing
+with tempfile.TemporaryDirectory() as workspace:
+    os.makedirs(os.path.join(workspace, "pkg", "sub"))
+    tools = ToolResultCache().wrap(
+        {"get_files_info": get_files_info, "write_file": write_file}
+    )
+    tools["get_files_info"](working_directory=workspace, directory=".", max_depth=3)
+    tools["write_file"](working_directory=workspace, file_path="pkg/sub/b.py", content="b = 1\n")
+    print('get_files_info(<workspace>, ".", max_depth=3) after write_file("pkg/sub/b.py"):')
+    result = tools["get_files_info"](working_directory=workspace, directory=".", max_depth=3)
+    print(result)
+print("\n" + "=" * 50 + "\n")
+
+import difflib
+
+# Test 15: Zero-context diffs (diff -U0) that only insert lines
+with tempfile.TemporaryDirectory() as workspace:
+    original = ["a\n", "b\n", "c\n"]
+    for edited in (
+        ["X\n", "a\n", "b\n", "c\n"],
+        ["a\n", "X\n", "b\n", "c\n"],
+        ["a\n", "b\n", "c\n", "X\n"],
+        ["a\n", "X\n", "b\n", "c\n", "Y\n"],
+    ):
+        with open(os.path.join(workspace, "f.txt"), "w") as file:
+            file.writelines(original)
+        diff = "".join(difflib.unified_diff(original, edited, n=0))
+        edit_file(workspace, "f.txt", diff=diff)
+        with open(os.path.join(workspace, "f.txt")) as file:
+            content = file.read()
+        print(f"{diff.splitlines()[2:]} -> {content!r} (expected {''.join(edited)!r})")
+print("\n" + "=" * 50 + "\n")
+
+from types import SimpleNamespace
+from agent.dispatcher import ToolDispatcher
+from agent.tracing import Tracer
+
+# Test 16: Tool spans run on the dispatcher's threads nest under the iteration span
+tracer = Tracer()
+traced = tracer.wrap_tools({"get_files_info": get_files_info})
+with ToolDispatcher(lambda fc: traced[fc.name](working_directory="calculator", **fc.args)) as dispatcher:
+    with tracer.span("iteration", "iteration"):
+        dispatcher.dispatch(
+            [SimpleNamespace(name="get_files_info", args={"directory": d}) for d in (".", "pkg")]
+        )
+records = [record for _, record in tracer._records()]
+iteration = next(record for record in records if record["name"] == "iteration")
+print("tool span parents:", [
+    record["parent"] == iteration["id"] and record["track"] == iteration["track"]
+    for record in records if record["category"] == "tool"
+])
+print("\n" + "=" * 50 + "\n")
+
+# Test 17: CRLF line endings come back as "\n", read whole or a page at a time
+with tempfile.TemporaryDirectory() as workspace:
+    with open(os.path.join(workspace, "crlf.txt"), "wb") as file:
+        file.write(b"line one\r\nline two\r\nthree\rfour\r\n")
+    print('get_file_content(<workspace>, "crlf.txt"):')
+    print(repr(get_file_content(workspace, "crlf.txt")))
+    print('get_file_content(<workspace>, "crlf.txt", offset=0, limit=9):')
+    print(repr(get_file_content(workspace, "crlf.txt", offset=0, limit=9)))
+    print('get_file_content(<workspace>, "crlf.txt", offset=10, limit=9):')
+    print(repr(get_file_content(workspace, "crlf.txt", offset=10, limit=9)))
+print("\n" + "=" * 50 + "\n")
+
+from functions.search_code import search_code
+
+# Test 18: A file written by a script is found by the next search
+with tempfile.TemporaryDirectory() as workspace:
+    with open(os.path.join(workspace, "gen.py"), "w") as file:
+        file.write('open("made.py", "w").write("generated_marker = 1\\n")\n')
+    search_code(workspace, "generated_marker")
+    run_python_file(workspace, "gen.py")
+    print('search_code(<workspace>, "generated_marker") after running gen.py:')
+    print(search_code(workspace, "generated_marker"))
+print("\n" + "=" * 50 + "\n")
+
+from functions.read_files import read_files
+
+# Test 19: Glob patterns reaching outside the working directory (should error)
+for pattern in ("../*.py", "/etc/pass*"):
+    print(f'read_files("calculator", pattern="{pattern}"):')
+    print(read_files("calculator", pattern=pattern))
+print("\n" + "=" * 50 + "\n")
+
+# Test 20: A test selector naming a path outside the working directory (should error)
+print('run_tests("calculator", tests=["/tmp/evil"]):')
+print(run_tests("calculator", tests=["/tmp/evil"]))
+print("\n" + "=" * 50 + "\n")
+
+from functions.get_file_content import get_file_content
+
+# Test 21: A write through a symlink drops what was cached under the real path
+with tempfile.TemporaryDirectory() as workspace:
+    os.makedirs(os.path.join(workspace, "pkg"))
+    os.symlink("pkg", os.path.join(workspace, "link"))
+    with open(os.path.join(workspace, "pkg", "a.py"), "w") as file:
+        file.write("a = 1\n")
+    tools = ToolResultCache().wrap(
+        {"get_file_content": get_file_content, "write_file": write_file}
+    )
+    tools["get_file_content"](working_directory=workspace, file_path="pkg/a.py")
+    before = os.stat(os.path.join(workspace, "pkg", "a.py"))
+    tools["write_file"](working_directory=workspace, file_path="link/a.py", content="a = 2\n")
+    # Same size and mtime as before, so only the invalidation can tell
+    os.utime(
+        os.path.join(workspace, "pkg", "a.py"), ns=(before.st_atime_ns, before.st_mtime_ns)
+    )
+    print('get_file_content(<workspace>, "pkg/a.py") after write_file("link/a.py"):')
+    print(tools["get_file_content"](working_directory=workspace, file_path="pkg/a.py"))
+print("\n" + "=" * 50 + "\n")
+
+from google.genai import types
+from agent.history import ConversationHistory
+
+# Test 22: A read_files output goes stale once a file it returned is written
+def call_turn(name, args, result):
+    return [
+        types.Content(role="model", parts=[types.Part.from_function_call(name=name, args=args)]),
+        types.Content(
+            role="user",
+            parts=[types.Part.from_function_response(name=name, response={"result": result})],
+        ),
+    ]
+
+history = ConversationHistory(
+    [types.Content(role="user", parts=[types.Part(text="Fix the calculator")])]
+    + call_turn(
+        "read_files",
+        {"pattern": "pkg/*.py"},
+        {"files": [{"path": "pkg/calculator.py", "content": "..."}, {"path": "pkg/render.py", "content": "..."}]},
+    )
+    + call_turn("write_file", {"file_path": "pkg/render.py", "content": "..."}, "Successfully wrote")
+    + [types.Content(role="model", parts=[types.Part(text="Done")])] * 4,
+)
+print("read_files output after write_file(pkg/render.py):")
+print(history.prompt()[2].parts[0].function_response.response)
+print("\n" + "=" * 50 + "\n")